@@ -0,0 +1,313 @@
+import itertools
+import json
+import os
+import queue
+import threading
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib import request
+
+from deepltranslator import DeepLTranslator
+from elementhandlers import (
+    ElementTranslator,
+    ExtractionCache,
+    StringExporter,
+)
+from filehandlers import (
+    ChunkProcessor,
+    WorkerPool,
+    process_content,
+)
+from stringfilter import StringFilter
+from run import (
+    course_handlers,
+    qbank_handlers,
+    transform_lang_code,
+)
+
+'''
+Long-running translation service.
+
+Translating a course or question bank via run.py loads the translations
+file and starts with empty caches every time. The daemon keeps the translation
+memory (one DeepLTranslator per translations file), the DeepL connection,
+the extraction cache, the translated element contents and the pools of worker
+processes in memory, and processes submitted jobs one after the other.
+If a translations file is changed by another program while the daemon runs,
+it is reloaded before the next job that uses it.
+
+Jobs are submitted via a local HTTP API:
+
+    POST /jobs          Submit a job (json), returns {"id": ...}
+    GET /jobs           Status of all jobs
+    GET /jobs/<id>      Status, progress and result of a job
+
+Job parameters:
+
+    type: "course" or "qbank"
+    path: Path to the extracted course folder or the question bank file
+    translations_file: Translations file (updated with the new translations)
+    target_lang: DeepL language code of the language to translate into
+    source_lang: (optional) DeepL language code of the content, default 'EN'
+    strings_file: (optional) File to write the extracted strings to
+    segment_sentences: (optional) see translate_content
+    filter_strings: (optional) Don't send strings without translatable text
+        (numbers, URLs, ...) for translation, see StringFilter
+    offline: (optional) Use the offline translator instead of the DeepL API
+    processes: (optional) Number of processes used to process question files
+        in chunks (see process_content). The pool of processes is kept for
+        later jobs with the same number of processes.
+'''
+
+DEFAULT_ADDRESS = ("127.0.0.1", 8642)
+
+
+class Job:
+    def __init__(self, job_id, params):
+        self.id = job_id
+        self.params = params
+        self.status = "queued"
+        self.files_extracted = 0
+        self.files_written = 0
+        self.strings = 0
+        self.result = None
+        self.error = None
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "status": self.status,
+            "params": self.params,
+            "files_extracted": self.files_extracted,
+            "files_written": self.files_written,
+            "strings": self.strings,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+def file_mtime(filename):
+    '''Modification time of the file, or None if it doesn't exist.'''
+    try:
+        return os.stat(filename).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+class JobStep(ChunkProcessor):
+    '''Passes the elements of each file on to processor, and counts the
+    processed files (or chunks of questions) in the job's counter attribute.'''
+
+    def __init__(self, job, processor, counter):
+        self.job = job
+        self.processor = processor
+        self.counter = counter
+
+    def process(self, elements):
+        self.processor.process(elements)
+        self.count()
+
+    def collect(self):
+        return self.processor.collect()
+
+    def merge(self, collected):
+        self.processor.merge(collected)
+        self.count()
+
+    def resident(self):
+        return self.processor.resident()
+
+    def count(self):
+        setattr(self.job, self.counter, getattr(self.job, self.counter) + 1)
+
+
+class TranslationDaemon:
+    def __init__(self, address=DEFAULT_ADDRESS, extraction_cache_size=100000):
+        self.address = address
+        self.jobs = {}
+        self.job_queue = queue.Queue()
+        self.job_ids = itertools.count(1)
+        self.lock = threading.Lock()
+        # Resident state shared by all jobs
+        self.translators = {}
+        # Modification time of the translations file when it was last read or written
+        self.translators_mtime = {}
+        self.element_translators = {}
+        self.pools = {}
+        self.extraction_cache = ExtractionCache(extraction_cache_size)
+
+    def submit(self, params):
+        for key in ["type", "path", "translations_file", "target_lang"]:
+            if key not in params:
+                raise ValueError(f"Missing job parameter {key}")
+        if params["type"] not in ["course", "qbank"]:
+            raise ValueError(f"Unknown job type {params['type']}")
+        with self.lock:
+            job = Job(next(self.job_ids), params)
+            self.jobs[job.id] = job
+        self.job_queue.put(job)
+        return job
+
+    def get_translator(self, translations_file, offline):
+        '''DeepLTranslator holding the translation memory of translations_file.
+        The file is reloaded if it was changed since the daemon last read or wrote it.'''
+        key = (translations_file, offline)
+        mtime = file_mtime(translations_file)
+        if key not in self.translators or self.translators_mtime[key] != mtime:
+            self.translators[key] = DeepLTranslator(None, translations_file, offline=offline)
+            self.translators_mtime[key] = mtime
+        return self.translators[key]
+
+    def translations_written(self, translations_file, offline):
+        '''Record that the daemon itself has written the translations file.'''
+        self.translators_mtime[(translations_file, offline)] = file_mtime(translations_file)
+
+    def get_element_translator(self, translations_file, target_lang, source_lang, segment_sentences):
+        '''ElementTranslator remembering the translated element contents across jobs.'''
+        key = (translations_file, target_lang, source_lang, segment_sentences)
+        if key not in self.element_translators:
+            self.element_translators[key] = ElementTranslator(
+                None, target_lang=transform_lang_code(target_lang),
+                source_lang=transform_lang_code(source_lang),
+                segment_sentences=segment_sentences,
+                extraction_cache=self.extraction_cache)
+        return self.element_translators[key]
+
+    def get_pool(self, processes):
+        '''Pool of worker processes used for chunks of question files. Its processes
+        keep the element translators and caches they receive between jobs.'''
+        if processes <= 1:
+            return None
+        if processes not in self.pools:
+            self.pools[processes] = WorkerPool(processes)
+        return self.pools[processes]
+
+    def work(self):
+        while True:
+            job = self.job_queue.get()
+            try:
+                self.run_job(job)
+                job.status = "done"
+            except Exception as e:
+                traceback.print_exc()
+                job.error = repr(e)
+                job.status = "failed"
+
+    def run_job(self, job):
+        params = job.params
+        source_lang = params.get("source_lang", "EN")
+        target_lang = params["target_lang"]
+        segment_sentences = params.get("segment_sentences", False)
+        if params["type"] == "course":
+            handlers = course_handlers()
+            root = Path(params["path"])
+        else:
+            handlers = qbank_handlers(params["path"])
+            root = Path(".")
+
+        pool = self.get_pool(params.get("processes", 1))
+        offline = params.get("offline", False)
+        extraction_hits = self.extraction_cache.hits
+        extraction_misses = self.extraction_cache.misses
+
+        job.status = "extracting"
+        bse = StringExporter(source_lang=transform_lang_code(source_lang),
+                             segment_sentences=segment_sentences,
+                             extraction_cache=self.extraction_cache)
+        process_content(handlers, root, JobStep(job, bse, "files_extracted"), pool=pool)
+        job.strings = len(bse.strings)
+        translator = self.get_translator(params["translations_file"], offline)
+        if params.get("filter_strings"):
+            StringFilter().apply(bse.strings, translator.cached_translations)
+        if params.get("strings_file"):
+            bse.write_strings(params["strings_file"])
+
+        job.status = "translating"
+        translator.strings = bse.strings
+        cached_before = len(translator.cached_translations)
+        try:
+            translator.translate(target_lang=target_lang, source_lang=source_lang, tag_handling="xml", ignore_tags="x")
+        finally:
+            self.translations_written(params["translations_file"], offline)
+
+        job.status = "inserting"
+        bet = self.get_element_translator(params["translations_file"], target_lang, source_lang, segment_sentences)
+        bet.update_translations(translator.new_translations)
+        content_hits = bet.content_cache.hits
+        content_misses = bet.content_cache.misses
+        process_content(handlers, root, JobStep(job, bet, "files_written"), write_output=True, pool=pool)
+        job.result = {
+            "strings": len(bse.strings),
+            "new_translations": len(translator.cached_translations) - cached_before,
+            "extraction_cache_hits": self.extraction_cache.hits - extraction_hits,
+            "extraction_cache_misses": self.extraction_cache.misses - extraction_misses,
+            "content_cache_hits": bet.content_cache.hits - content_hits,
+            "content_cache_misses": bet.content_cache.misses - content_misses,
+        }
+
+    def serve_forever(self):
+        threading.Thread(target=self.work, daemon=True).start()
+        server = ThreadingHTTPServer(self.address, make_request_handler(self))
+        print(f"Translation daemon listening on {self.address[0]}:{self.address[1]}")
+        server.serve_forever()
+
+
+def make_request_handler(daemon):
+    class RequestHandler(BaseHTTPRequestHandler):
+        def send_json(self, code, data):
+            body = json.dumps(data).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            parts = self.path.strip("/").split("/")
+            if parts == ["jobs"]:
+                with daemon.lock:
+                    jobs = list(daemon.jobs.values())
+                self.send_json(200, [job.to_dict() for job in jobs])
+            elif len(parts) == 2 and parts[0] == "jobs" and parts[1].isdigit() and int(parts[1]) in daemon.jobs:
+                self.send_json(200, daemon.jobs[int(parts[1])].to_dict())
+            else:
+                self.send_json(404, {"error": "Not found"})
+
+        def do_POST(self):
+            if self.path.strip("/") != "jobs":
+                self.send_json(404, {"error": "Not found"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                params = json.loads(self.rfile.read(length))
+                job = daemon.submit(params)
+            except (ValueError, TypeError) as e:
+                self.send_json(400, {"error": str(e)})
+                return
+            self.send_json(202, {"id": job.id})
+
+        def log_message(self, format, *args):
+            pass
+
+    return RequestHandler
+
+
+def submit_job(params, address=DEFAULT_ADDRESS):
+    '''Submit a job to a running daemon and return its id.'''
+    req = request.Request(
+        f"http://{address[0]}:{address[1]}/jobs",
+        data=json.dumps(params).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+    )
+    with request.urlopen(req) as response:
+        return json.load(response)["id"]
+
+
+def job_status(job_id, address=DEFAULT_ADDRESS):
+    with request.urlopen(f"http://{address[0]}:{address[1]}/jobs/{job_id}") as response:
+        return json.load(response)
+
+
+if __name__ == "__main__":
+    TranslationDaemon().serve_forever()
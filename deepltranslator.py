@@ -9,57 +9,112 @@ def load_auth_key(filename):
     return data["auth_key"]
 
 
+def load_translations(filename):
+    '''Load a translations file (json flat dict), if it exists.'''
+    if not Path(filename).is_file():
+        return {}
+    with open(filename) as f:
+        return json.load(f)
+
+
+# Maximum number of strings sent to DeepL in a single request
+BATCH_SIZE = 50
+
+
+class OfflineResult:
+    def __init__(self, text):
+        self.text = text
+
+
+class OfflineTranslator:
+    '''
+    Stand-in for deepl.Translator that doesn't make any network calls
+    and returns each text unchanged. Useful for testing the workflow.
+    '''
+
+    def translate_text(self, texts, **kwargs):
+        return [OfflineResult(text) for text in texts]
+
+
 class DeepLTranslator:
-    def __init__(self, stringfile, translationfile, outputfile=None):
+    def __init__(self, stringfile, translationfile, outputfile=None, offline=False, auth_key=None, auth_key_file="auth_key.json"):
         '''
         stringfile: Strings to be translated (json flat dict)
+            Strings whose value is not None (e.g. labelled by StringFilter)
+            are given that value as translation instead of being translated.
+            May be None if strings are passed to translate_batch directly.
         translationfile: Pre-existing translations (json flat dict)
         outputfile: Destination to write translations for strings to (json flat dict)
             If not provided, translationfile is updated with the new translations.
+        offline: Use OfflineTranslator instead of the DeepL API
+        auth_key: DeepL auth key. If not provided, it is read from auth_key_file.
+        auth_key_file: File containing the DeepL auth key (see load_auth_key)
         '''
-        with open(stringfile) as f:
-            self.strings = json.load(f)
-            self.cached_translations = {}
-            trs_file = Path(translationfile)
-            if trs_file.is_file():
-                with open(trs_file) as f:
-                    self.cached_translations = json.load(f)
-            self.outputfile = outputfile or translationfile
-            self.inplace = self.outputfile == translationfile
+        self.strings = {}
+        if stringfile is not None:
+            with open(stringfile) as f:
+                self.strings = json.load(f)
+        self.cached_translations = load_translations(translationfile)
+        self.outputfile = outputfile or translationfile
+        self.inplace = self.outputfile == translationfile
+        self.new_translations = {}
+        self.offline = offline
+        self.auth_key = auth_key
+        self.auth_key_file = auth_key_file
+        self.translator = None
+
+    def connect(self):
+        if self.translator is None and self.offline:
+            self.translator = OfflineTranslator()
+        elif self.translator is None:
+            auth_key = self.auth_key or load_auth_key(self.auth_key_file)
+            self.translator = deepl.Translator(auth_key)
 
     def translate(self, **kwargs):
-        auth_key = load_auth_key("auth_key.json")
-        self.translator = deepl.Translator(auth_key)
+        self.connect()
         total = 0
-        count = 0
         batch = []
         self.new_translations = {}
-        for src, _ in self.strings.items():
+        given = {}
+        for src, trs in self.strings.items():
             if src in self.cached_translations:
                 self.new_translations[src] = self.cached_translations[src]
                 continue
-            if count < 49:
-                batch.append(src)
-                total += 1
-                count += 1
-            else:
-                batch.append(src)
-                total += 1
+            if trs is not None:
+                given[src] = trs
+                continue
+            batch.append(src)
+            total += 1
+            if len(batch) == BATCH_SIZE:
                 self.translate_batch(batch, **kwargs)
-                count = 0
                 batch = []
         if batch:
             self.translate_batch(batch, **kwargs)
+        if given:
+            self.add_translations(given)
+        elif not self.inplace:
+            # Make sure cached translations of the strings are written
+            # even if there were no new strings to translate
+            self.write_translations()
         print(f"Translated {total} new strings.")
 
     def translate_batch(self, batch, **kwargs):
+        self.add_translations(self.request_batch(batch, **kwargs))
+
+    def request_batch(self, batch, **kwargs):
+        '''Translate the strings in batch and return a dict of their translations.'''
         result = self.translator.translate_text(batch, **kwargs)
         batch_tr = [entry.text for entry in result]
-        translations = {k:v for k,v in zip(batch, batch_tr)}
+        return {k:v for k,v in zip(batch, batch_tr)}
+
+    def add_translations(self, translations):
         self.new_translations.update(translations)
         self.cached_translations.update(translations)
         # Update outputfile with new batch of translations
         # We do this periodically as not to lose progress in case of a failure
+        self.write_translations()
+
+    def write_translations(self):
         if self.inplace:
             with open(self.outputfile, "w") as f:
                 json.dump(self.cached_translations, f, indent=4)
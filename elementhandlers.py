@@ -1,35 +1,271 @@
+import itertools
 import json
+import os
+import weakref
+from collections import OrderedDict
 
 from bs4 import BeautifulSoup
 
+from elements import (
+    TranslatableContentElement,
+    STACKTextElement,
+)
+from extract import split_sentences
+from filehandlers import ChunkProcessor
 
-class StringExporter:
-    def __init__(self, source_lang='en'):
+# Element types that have their own lookup table of translations
+TRANSLATION_TABLE_TYPES = [
+    TranslatableContentElement,
+    STACKTextElement,
+]
+
+
+# Caches of this process that stand in for caches of other processes, by their key
+_received_caches = weakref.WeakValueDictionary()
+_cache_keys = itertools.count(1)
+
+
+def _received_cache(cls, key, maxsize):
+    cache = _received_caches.get(key)
+    if cache is None:
+        cache = cls(maxsize)
+        cache.key = key
+        _received_caches[key] = cache
+    return cache
+
+
+class LRUCache:
+    '''Dict-like cache holding at most maxsize entries, evicting the least
+    recently used entry when full. Counts cache hits and misses.
+
+    A cache is not copied when it is pickled, e.g. along with a processor that
+    is sent to worker processes. Instead, each process has its own cache in
+    its place, which it keeps using for all copies of the processor it receives.'''
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.key = (os.getpid(), next(_cache_keys))
+
+    def get(self, key):
+        '''Return the entry for key, or None if there is none.'''
+        if key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def __reduce__(self):
+        return (_received_cache, (type(self), self.key, self.maxsize))
+
+    def collect_stats(self):
+        '''Return and reset the number of cache hits and misses (see ChunkProcessor).'''
+        stats = (self.hits, self.misses)
+        self.hits = 0
+        self.misses = 0
+        return stats
+
+    def merge_stats(self, stats):
+        self.hits += stats[0]
+        self.misses += stats[1]
+
+
+class ExtractionCache(LRUCache):
+    '''Remembers the text pieces extracted from element contents,
+    so that identical contents are only parsed once.'''
+
+    def extract_content(self, e):
+        key = (type(e).__name__, e.text)
+        texts = self.get(key)
+        if texts is None:
+            texts = e.extract_content()
+            self.put(key, texts)
+        return list(texts)
+
+
+def extract_content(e, extraction_cache=None):
+    if extraction_cache is None:
+        return e.extract_content()
+    return extraction_cache.extract_content(e)
+
+
+def collect_stats(cache):
+    return None if cache is None else cache.collect_stats()
+
+
+def merge_stats(cache, stats):
+    if cache is not None and stats is not None:
+        cache.merge_stats(stats)
+
+
+class StringExporter(ChunkProcessor):
+    def __init__(self, source_lang='en', segment_sentences=False, extraction_cache=None):
+        '''
+        segment_sentences: Export individual sentences rather than whole
+            text pieces, so that sentences shared between different
+            paragraphs are only translated once.
+        extraction_cache: ExtractionCache to reuse extraction results
+        '''
         self.strings = {}
         self.source_lang = source_lang
+        self.segment_sentences = segment_sentences
+        self.extraction_cache = extraction_cache
 
     def process(self, elements):
+        for text in self.extract_strings(elements):
+            self.strings[text] = None
+
+    def extract_strings(self, elements):
+        '''Return the list of strings to be translated for the given elements.'''
+        strings = []
         for e in elements:
-            texts = e.extract_content()
+            texts = extract_content(e, self.extraction_cache)
             for text in texts:
-                self.strings[text] = None
+                if self.segment_sentences:
+                    strings += split_sentences(text)[::2]
+                else:
+                    strings.append(text)
+        return strings
+
+    def collect(self):
+        '''Return and reset the strings collected so far and the
+        extraction cache statistics (see ChunkProcessor).'''
+        strings = self.strings
+        self.strings = {}
+        return strings, collect_stats(self.extraction_cache)
+
+    def merge(self, collected):
+        strings, extraction_stats = collected
+        self.strings.update(strings)
+        merge_stats(self.extraction_cache, extraction_stats)
 
     def write_strings(self, filename):
         with open(filename, "w") as f:
             json.dump(self.strings, f, indent=4)
 
 
-class ElementTranslator:
-    def __init__(self, translation_file, target_lang, source_lang='en'):
-        with open(translation_file) as f:
-            self.translations = json.load(f)
+class ElementTranslator(ChunkProcessor):
+    def __init__(self, translation_file, target_lang, source_lang='en', segment_sentences=False, extraction_cache=None, cache_size=10000):
+        '''
+        translation_file: Translations (json flat dict). If None, the translations
+            need to be added via update_translations before processing elements.
+        segment_sentences: The translation file contains translations of
+            individual sentences (see StringExporter), which are reassembled
+            into translations of the text pieces.
+        extraction_cache: ExtractionCache to reuse extraction results
+        cache_size: Number of translated element contents to remember, so that
+            elements with identical content are only translated once.
+        '''
+        translations = {}
+        if translation_file is not None:
+            with open(translation_file) as f:
+                translations = json.load(f)
+        # Incremented whenever an existing translation changes,
+        # invalidating the cached translated element contents
+        self.translations_version = 0
+        self.set_translations(translations)
         self.target_lang = target_lang
         self.source_lang = source_lang
+        self.segment_sentences = segment_sentences
+        self.extraction_cache = extraction_cache
+        self.content_cache = LRUCache(cache_size)
+
+    def set_translations(self, translations):
+        '''Set the translations, and precompute the lookup table for each type
+        of element from them. Each table is a full copy of the translations
+        (unless it's identical to them). A WorkerPool receives them only once,
+        and then only the translations added by update_translations.'''
+        self.translations = translations
+        self.translations_version += 1
+        self.tables = {
+            t.translation_table: t.prepare_translations(translations)
+            for t in TRANSLATION_TABLE_TYPES
+        }
+        # The copies held by the processes of a WorkerPool are out of date
+        self.worker_key = None
+        self.worker_updates = {}
+        # Translations of text pieces assembled from the translations of their sentences,
+        # for the translations_version they were assembled from
+        self.assembled = {}
+        self.assembled_version = self.translations_version
+
+    def update_translations(self, translations):
+        for src, trs in translations.items():
+            if src in self.translations and self.translations[src] != trs:
+                self.translations_version += 1
+        if self.worker_key is not None:
+            self.worker_updates.update(
+                (src, trs) for src, trs in translations.items() if self.translations.get(src) != trs)
+        self.translations.update(translations)
+        for t in TRANSLATION_TABLE_TYPES:
+            table = self.tables[t.translation_table]
+            if table is not self.translations:
+                table.update(t.prepare_translations(translations))
 
     def process(self, elements):
         for e in elements:
             self.translate_content(e)
 
     def translate_content(self, e):
-        texts = e.extract_content()
-        e.replace_text_pieces(texts, self.translations, self.target_lang, self.source_lang)
+        key = (type(e).__name__, e.text, self.source_lang, self.target_lang, self.translations_version)
+        html = self.content_cache.get(key)
+        if html is None:
+            texts = extract_content(e, self.extraction_cache)
+            if self.segment_sentences:
+                table = e.prepare_translations(self.assemble_translations(texts))
+            else:
+                table = self.tables[e.translation_table]
+            html = e.translate_text_pieces(texts, table, self.target_lang, self.source_lang)
+            self.content_cache.put(key, html)
+        e.replace_content_with(html)
+
+    def collect(self):
+        '''Return and reset the cache statistics (see ChunkProcessor).'''
+        return self.content_cache.collect_stats(), collect_stats(self.extraction_cache)
+
+    def merge(self, collected):
+        content_stats, extraction_stats = collected
+        self.content_cache.merge_stats(content_stats)
+        merge_stats(self.extraction_cache, extraction_stats)
+
+    def worker_update(self):
+        '''The translations added since the last call (see ChunkProcessor).'''
+        update = self.worker_updates
+        self.worker_updates = {}
+        return update
+
+    def apply_worker_update(self, update):
+        self.update_translations(update)
+
+    def print_report(self):
+        print(f"Translated element contents: {self.content_cache.hits} cache hits, "
+              f"{self.content_cache.misses} cache misses.")
+
+    def assemble_translations(self, texts):
+        '''Return the translations of the text pieces `texts`, composed
+        from the translations of their sentences. The assembled translations
+        are kept separate from the translations, and are discarded when
+        a translation changes.'''
+        if self.assembled_version != self.translations_version:
+            self.assembled = {}
+            self.assembled_version = self.translations_version
+        translations = {}
+        for text in texts:
+            if text in self.translations:
+                translations[text] = self.translations[text]
+                continue
+            if text not in self.assembled:
+                segments = split_sentences(text)
+                segments[::2] = [self.translations[s] for s in segments[::2]]
+                self.assembled[text] = ''.join(segments)
+            translations[text] = self.assembled[text]
+        return translations
@@ -10,8 +10,24 @@ from extract import (
 )
 
 
+def remove_protection_tags(text):
+    '''Remove the <x> tags that protect content from translation'''
+    return text.replace("<x>", "").replace("</x>", "")
+
+
 class TranslatableContentElement(ABC):
 
+    '''Name of the lookup table of translations used by this type of element.
+    Element types that need the translations in a different form have their
+    own table, computed from the translations by prepare_translations.'''
+    translation_table = "text"
+
+    @staticmethod
+    def prepare_translations(translations):
+        '''Return the lookup table used for this type of element,
+        computed from a dict of translations.'''
+        return translations
+
     @abstractmethod
     def __init__(self, xmlelement):
         '''Should define self.element and self.text'''
@@ -38,6 +54,14 @@ class TranslatableContentElement(ABC):
     def replace_text_pieces(self, texts, translations, target_lang, source_lang='en'):
         '''mutate self.element by replacing each text piece from `texts` occurring
         in the element with a translated or multi-language version.'''
+        html = self.translate_text_pieces(texts, translations, target_lang, source_lang)
+        self.replace_content_with(html)
+
+    def translate_text_pieces(self, texts, translations, target_lang, source_lang='en'):
+        '''Return the element's text where each text piece from `texts`
+        is replaced with a translated or multi-language version.
+        `translations` is the lookup table for this type of element
+        (see prepare_translations).'''
 
         # In order to deal with translation strings that may be
         # substrings of some other translation strings, we go in
@@ -63,7 +87,7 @@ class TranslatableContentElement(ABC):
         # html = self.postprocess_castext(html)
         html = html.replace("\xa0", "&nbsp;")
         html = html.replace("&lt;", "<").replace("&gt;", ">").replace("&amp;", "&")
-        self.replace_content_with(html)
+        return html
 
 
 class CourseContentElement(TranslatableContentElement):
@@ -106,14 +130,13 @@ class HTMLTextElement(TranslatableContentElement):
 class STACKTextElement(TranslatableContentElement):
     '''XML element containing CasText'''
 
-    '''This type of TextElement needs to preprocess the translations.
-    So that it doesn't have to be done for every single call of replace_text_pieces,
-    we cache the result of the first time replace_text_pieces is called, and store it
-    in this singleton attribute.'''
-    translations = {}
+    translation_table = "castext"
 
-    def reset_translations():
-        STACKTextElement.translations = {}
+    @staticmethod
+    def prepare_translations(translations):
+        '''The <x> tags added by preprocess_castext are not part of the element's
+        text, so they are removed from the translations.'''
+        return {remove_protection_tags(src): remove_protection_tags(trs) for src, trs in translations.items()}
 
     def extract_content(self, language='en'):
         text = preprocess_castext(self.text)
@@ -123,14 +146,9 @@ class STACKTextElement(TranslatableContentElement):
         # return f"[[lang code='en,other']]{text}[[/lang]][[lang code='fr']]{translation}[[/lang]]"
         return f"{{mlang {source_lang}}}{text}{{mlang}}{{mlang {target_lang}}}{translation}{{mlang}}"
 
-    def replace_text_pieces(self, texts, translations, target_lang, source_lang='en'):
-        if not STACKTextElement.translations:
-            for src, trs in translations.items():
-                src = src.replace("<x>", "").replace("</x>", "")
-                trs = trs.replace("<x>", "").replace("</x>", "")
-                CourseSTACKTextElement.translations[src] = trs
-        texts = [t.replace("<x>", "").replace("</x>", "") for t in texts]
-        super().replace_text_pieces(texts, STACKTextElement.translations, target_lang, source_lang)
+    def translate_text_pieces(self, texts, translations, target_lang, source_lang='en'):
+        texts = [remove_protection_tags(t) for t in texts]
+        return super().translate_text_pieces(texts, translations, target_lang, source_lang)
 
 
 class MaximaTextElement(TranslatableContentElement):
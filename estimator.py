@@ -0,0 +1,119 @@
+import json
+import math
+from collections import Counter
+from pathlib import Path
+
+from deepltranslator import BATCH_SIZE
+from filehandlers import read_files
+
+
+def handler_name(handler):
+    name = type(handler).__name__
+    activity_type = getattr(handler, "activity_type", None)
+    if activity_type:
+        name += f"({activity_type})"
+    return name
+
+
+class CostEstimator:
+    '''
+    Dry run of a translation: Extract the strings like StringExporter does,
+    but instead of translating them, collect statistics and estimate how
+    many characters would be sent to DeepL, and what this would cost.
+    No network calls are made.
+    '''
+
+    def __init__(self, exporter, translations_file=None, string_filter=None, batch_size=BATCH_SIZE,
+                 seconds_per_batch=1.0, chars_per_second=10000, cost_per_million_chars=20.0):
+        '''
+        exporter: StringExporter used to extract strings from the elements
+        translations_file: Pre-existing translations (json flat dict), if any
+        string_filter: StringFilter labelling strings that are not sent for translation
+        batch_size: Number of strings per DeepL request
+        seconds_per_batch: Latency overhead of a single DeepL request
+        chars_per_second: DeepL translation throughput in characters per second
+        cost_per_million_chars: Price of translating a million characters
+        '''
+        self.exporter = exporter
+        self.cached_translations = {}
+        if translations_file is not None and Path(translations_file).is_file():
+            with open(translations_file) as f:
+                self.cached_translations = json.load(f)
+        self.string_filter = string_filter
+        self.batch_size = batch_size
+        self.seconds_per_batch = seconds_per_batch
+        self.chars_per_second = chars_per_second
+        self.cost_per_million_chars = cost_per_million_chars
+        self.total_strings = 0
+        self.total_chars = 0
+        self.chars_per_handler = Counter()
+        self.chars_per_element_type = Counter()
+        self.files = 0
+
+    def process(self, handlers, root):
+        for fp in handlers:
+            name = handler_name(fp)
+            for path, soup, elements in read_files([fp], root):
+                self.files += 1
+                for e in elements:
+                    strings = self.exporter.extract_strings([e])
+                    chars = sum(len(s) for s in strings)
+                    self.total_strings += len(strings)
+                    self.total_chars += chars
+                    self.chars_per_handler[name] += chars
+                    self.chars_per_element_type[type(e).__name__] += chars
+                    for s in strings:
+                        self.exporter.strings[s] = None
+
+    def report(self):
+        unique = list(self.exporter.strings)
+        unique_chars = sum(len(s) for s in unique)
+        cached = [s for s in unique if s in self.cached_translations]
+        cached_chars = sum(len(s) for s in cached)
+        filtered = []
+        if self.string_filter is not None:
+            filtered = [s for s in unique if s not in self.cached_translations and self.string_filter.classify(s)]
+        filtered_chars = sum(len(s) for s in filtered)
+        new_strings = len(unique) - len(cached) - len(filtered)
+        new_chars = unique_chars - cached_chars - filtered_chars
+        batches = math.ceil(new_strings / self.batch_size)
+        return {
+            "files": self.files,
+            "total_strings": self.total_strings,
+            "total_chars": self.total_chars,
+            "unique_strings": len(unique),
+            "unique_chars": unique_chars,
+            "deduplication_ratio": self.total_strings / len(unique) if unique else 1.0,
+            "chars_per_handler": dict(self.chars_per_handler),
+            "chars_per_element_type": dict(self.chars_per_element_type),
+            "cached_strings": len(cached),
+            "cached_chars": cached_chars,
+            "cache_hit_rate": len(cached) / len(unique) if unique else 1.0,
+            "filtered_strings": len(filtered),
+            "filtered_chars": filtered_chars,
+            "new_strings": new_strings,
+            "new_chars": new_chars,
+            "batches": batches,
+            "api_seconds": batches * self.seconds_per_batch + new_chars / self.chars_per_second,
+            "cost": new_chars / 1e6 * self.cost_per_million_chars,
+        }
+
+    def print_report(self):
+        r = self.report()
+        print(f"Files: {r['files']}")
+        print(f"Strings: {r['total_strings']} total, {r['unique_strings']} unique "
+              f"(deduplication ratio {r['deduplication_ratio']:.2f})")
+        print(f"Characters: {r['total_chars']} total, {r['unique_chars']} unique")
+        print("Characters per handler:")
+        for name, chars in sorted(r["chars_per_handler"].items()):
+            print(f"    {name}: {chars}")
+        print("Characters per element type:")
+        for name, chars in sorted(r["chars_per_element_type"].items()):
+            print(f"    {name}: {chars}")
+        print(f"Cached: {r['cached_strings']} strings, {r['cached_chars']} characters "
+              f"(hit rate {r['cache_hit_rate']:.1%})")
+        if self.string_filter is not None:
+            print(f"Not translatable: {r['filtered_strings']} strings, {r['filtered_chars']} characters")
+        print(f"To translate: {r['new_strings']} strings, {r['new_chars']} characters "
+              f"in {r['batches']} batches")
+        print(f"Estimated API time: {r['api_seconds']:.1f}s, estimated cost: {r['cost']:.2f}")
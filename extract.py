@@ -4,6 +4,8 @@ import string
 from bs4 import BeautifulSoup
 import bs4
 
+import htmltree
+
 '''
 May contain &lt; &gt; &amp; (escaped HTML) which needs to be converted.
 
@@ -34,6 +36,17 @@ EXCLUDED_TAGS = [
     "debug", "include", "define", "commonstring", "pfs",  # STACK
 ]
 
+# Functions parsing element content into a BeautifulSoup(-like) tree.
+# "htmltree" is faster, and is checked to be equivalent to "html.parser"
+# by parsercheck.py.
+PARSER_BACKENDS = {
+    "html.parser": lambda html: BeautifulSoup(html, features="html.parser"),
+    "htmltree": htmltree.parse,
+}
+parser_backend = "html.parser"
+COMMENT_TYPES = (bs4.element.Comment, htmltree.Comment)
+TAG_TYPES = (bs4.element.Tag, htmltree.Element)
+
 
 def preprocess_castext(html):
     '''
@@ -82,6 +95,94 @@ def segment_by_tag(html):
     return segments
 
 
+TAG_RE = re.compile(r'<(/?)([A-Za-z][A-Za-z0-9]*)[^<>]*?(/?)>')
+# Text pieces shorter than this are not translated
+MIN_TEXT_LENGTH = 5
+# Abbreviations (lowercase) after which a sentence does not end
+ABBREVIATIONS = {
+    "e.g.", "i.e.", "etc.", "cf.", "vs.", "approx.", "resp.", "incl.", "al.",
+    "mr.", "mrs.", "ms.", "dr.", "prof.", "st.", "jr.", "sr.",
+    "fig.", "figs.", "eq.", "eqs.", "sec.", "ch.", "vol.", "p.", "pp.",
+}
+# A single capital letter, e.g. an initial as in "J. Smith"
+INITIAL_RE = re.compile(r'[A-Z]\.')
+# Sentence-final punctuation, possibly followed by closing quotes/brackets
+# and closing tags, followed by the whitespace separating it from the next sentence
+SENTENCE_END_RE = re.compile(r'[.!?\u2026][\'")\]\u2019\u201d]*(?:</[A-Za-z][A-Za-z0-9]*>)*(\s+)')
+
+
+def _top_level_positions(html):
+    '''
+    Return a list of booleans indicating for each character of html
+    whether it is plain text that is not enclosed in any tag, e.g. in
+    "a <b>b</b> c" only the "a " and " c" are top-level.
+    '''
+    mask = []
+    depth = 0
+    pos = 0
+    for m in TAG_RE.finditer(html):
+        mask += [depth == 0] * (m.start() - pos)
+        mask += [False] * (m.end() - m.start())
+        closing, name, selfclosing = m.groups()
+        if closing:
+            depth = max(depth - 1, 0)
+        elif not selfclosing and name.lower() not in htmltree.VOID_TAGS:
+            depth += 1
+        pos = m.end()
+    mask += [depth == 0] * (len(html) - pos)
+    return mask
+
+
+def _ends_with_abbreviation(html):
+    '''Whether the last word of html is an abbreviation or an initial.'''
+    words = TAG_RE.sub("", html).split()
+    if not words:
+        return False
+    word = words[-1].lstrip("([\'\"\u2018\u201c")
+    return word.lower() in ABBREVIATIONS or bool(INITIAL_RE.fullmatch(word))
+
+
+def _merge_short_sentences(segments):
+    '''Merge sentences shorter than MIN_TEXT_LENGTH into their neighbours.'''
+    merged = segments[:1]
+    for i in range(1, len(segments), 2):
+        separator, sentence = segments[i], segments[i + 1]
+        if len(merged[-1]) < MIN_TEXT_LENGTH or len(sentence) < MIN_TEXT_LENGTH:
+            merged[-1] += separator + sentence
+        else:
+            merged += [separator, sentence]
+    return merged
+
+
+def split_sentences(html):
+    '''
+    Split an extracted text piece into sentences.
+
+    Returns a list of segments alternating between sentences (even indices)
+    and the whitespace separating them (odd indices), so that joining
+    the segments yields the original text. We only split at whitespace
+    that is not enclosed in a tag, so that inline formatting tags
+    and <x> protected maths stay intact within a sentence.
+    The next sentence has to start with a character that is not lowercase,
+    and we don't split after abbreviations (see ABBREVIATIONS) or initials.
+    Sentences shorter than MIN_TEXT_LENGTH are merged into their neighbours.
+    '''
+    mask = _top_level_positions(html)
+    segments = []
+    lastpos = 0
+    for m in SENTENCE_END_RE.finditer(html):
+        start, end = m.span(1)
+        if end == len(html) or not mask[start] or html[end].islower():
+            continue
+        if _ends_with_abbreviation(html[lastpos:start]):
+            continue
+        segments.append(html[lastpos:start])
+        segments.append(html[start:end])
+        lastpos = end
+    segments.append(html[lastpos:])
+    return _merge_short_sentences(segments)
+
+
 def remove_nested_tags(html):
     segments = segment_by_tag(html)
 
@@ -102,13 +203,25 @@ def remove_nested_tags(html):
     return ''.join(new_segments)
 
 
+def set_parser_backend(name):
+    '''Select the parser used for element content, one of PARSER_BACKENDS.'''
+    global parser_backend
+    if name not in PARSER_BACKENDS:
+        raise ValueError(f"Unknown parser backend {name}, expected one of {list(PARSER_BACKENDS)}")
+    parser_backend = name
+
+
+def parse_html(html):
+    return PARSER_BACKENDS[parser_backend](html)
+
+
 def standardize_content(html):
 
     # This simplified solution changes the original formatting,
     # and all linebreaks are lost. We could use .prettify(),
     # but then we get a lot of extraneous linebreaks
     # html = html.replace("&amp;", "&amp;amp;").replace("&lt;", "&amp;lt;").replace("&gt;", "&amp;gt;")
-    return str(BeautifulSoup(html, features="html.parser"))
+    return str(parse_html(html))
 
 
 def standardize_content_partial(html):
@@ -130,7 +243,7 @@ def standardize_content_partial(html):
     attr_tags = re.findall(r'<[A-Za-z]+[A-Za-z0-9]*\s+.+?>', html)
     for tag in set(attr_tags):
         # Convert to BS and back to string to get canonical attribute order
-        std = str(BeautifulSoup(tag, features="html.parser"))
+        std = str(parse_html(tag))
         # BS inserts a closing tag, remove that.
         std = re.sub(r"</[A-Za-z]+[A-Za-z0-9]*>", "", std)
         # Replace instance in html with canonical version
@@ -142,10 +255,10 @@ def standardize_content_partial(html):
 
 
 def extract_content(orig, language='en'):
-    soup = BeautifulSoup(orig, features="html.parser")
+    soup = parse_html(orig)
     texts = _extract_texts(soup)
     validate_extraction(orig, texts)
-    return [t for t in texts if len(t) >= 5]
+    return [t for t in texts if len(t) >= MIN_TEXT_LENGTH]
 
 
 def _extract_texts(element):
@@ -156,7 +269,7 @@ def _extract_texts(element):
     last_piece = ""
     texts = []
     for e in element.children:
-        if isinstance(e, bs4.element.Comment):
+        if isinstance(e, COMMENT_TYPES):
             last_piece = last_piece.strip(string.whitespace + '\xa0')
             if last_piece:
                 texts.append(last_piece)
@@ -183,9 +296,9 @@ def _is_formatted_text(element):
     if element.name not in FORMATTING_TAGS:
         return False
     for child in element.findChildren():
-        if isinstance(child, bs4.element.Comment):
+        if isinstance(child, COMMENT_TYPES):
             return False
-        if isinstance(child, bs4.element.Tag) and child.name not in FORMATTING_TAGS:
+        if isinstance(child, TAG_TYPES) and child.name not in FORMATTING_TAGS:
             return False
     return True
 
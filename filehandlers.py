@@ -1,8 +1,14 @@
+from collections import OrderedDict
+from multiprocessing import Pool
 from pathlib import Path
+import itertools
 import os
+import re
 
 from bs4 import BeautifulSoup
 
+import extract
+
 from elements import (
     QBankHTMLTextElement,
     QBankSTACKTextElement,
@@ -23,6 +29,10 @@ def elements_from_tag_tree(soup, tags):
 
 
 class XMLFileHandler:
+    '''If chunk_tag is set, a file can be split into chunks of elements with this tag
+    that can be processed independently (see process_content)'''
+    chunk_tag = None
+
     def get_files(root):
         '''Returns a list of XML files to process for translation'''
         return []
@@ -31,6 +41,11 @@ class XMLFileHandler:
         '''Returns a list of TranslatableElements'''
         return []
 
+    def get_chunk_elements(self, chunk):
+        '''Returns a list of TranslatableElements within the chunk_tag elements
+        that are the children of chunk'''
+        return []
+
 
 class SectionXMLFileHandler(XMLFileHandler):
     def get_files(self, root):
@@ -69,6 +84,8 @@ class SectionXMLFileHandler(XMLFileHandler):
 '''
 
 class QuestionsXMLFileHandler(XMLFileHandler):
+    chunk_tag = "question"
+
     def get_files(self, root):
         return root.glob("questions.xml")
 
@@ -85,6 +102,10 @@ class QuestionsXMLFileHandler(XMLFileHandler):
         ])
         return self.get_question_elements(questions) + self.get_stack_question_elements(questions)
 
+    def get_chunk_elements(self, chunk):
+        questions = chunk.findChildren("question", recursive=False)
+        return self.get_question_elements(questions) + self.get_stack_question_elements(questions)
+
     def get_common_question_elements(self, questions):
         return [
             e for q in questions for e in (
@@ -205,6 +226,8 @@ All fields have a <text> subfield.
 '''
 
 class QBankXMLFileHandler(XMLFileHandler):
+    chunk_tag = "question"
+
     def __init__(self, filename):
         self.filename = filename
 
@@ -218,6 +241,10 @@ class QBankXMLFileHandler(XMLFileHandler):
         ])
         return self.get_question_elements(questions) + self.get_stack_question_elements(questions)
 
+    def get_chunk_elements(self, chunk):
+        questions = chunk.findChildren("question", recursive=False)
+        return self.get_question_elements(questions) + self.get_stack_question_elements(questions)
+
     def get_question_elements(self, questions):
         mcq_questions = [q for q in questions if q["type"] == 'multichoice']
         cloze_questions = [q for q in questions if q["type"] == 'cloze']
@@ -322,22 +349,237 @@ class PageActivityXMLFileHandler(ActivityXMLFileHandler):
         return parent_elements + [CourseHTMLTextElement(e) for e in elements]
 
 
-def process_content(handlers, root, f_proc, write_output=False):
+def read_files(handlers, root):
     '''
-    f_proc is a processor function over all the translatable elements that
-    were found in a file. It may mutate the elements, so that when we dump
-    the soup into a new file, it contains the mutated elements.
+    Parse all files of the handlers, and yield tuples (path, soup, elements)
+    of each file's path, its parsed content and its translatable elements.
     '''
     for fp in handlers:
         for path in fp.get_files(root):
             with open(path, "r") as f:
                 # print(path)
                 content = f.read()
-                soup = BeautifulSoup(content, 'xml')
-                elements = fp.get_translatable_elements(soup)
-                f_proc(elements)
-                if write_output:
-                    dest = Path("output") / path
-                    os.makedirs(dest.parent, exist_ok=True)
-                    with open(dest, "w") as file:
-                        file.write(str(soup))
+            soup = BeautifulSoup(content, 'xml')
+            yield path, soup, fp.get_translatable_elements(soup)
+
+
+def write_output_file(path, soup):
+    '''Dump the (mutated) soup of the file at path, or its serialized content,
+    into the output folder.'''
+    dest = Path("output") / path
+    os.makedirs(dest.parent, exist_ok=True)
+    with open(dest, "w") as file:
+        file.write(str(soup))
+
+
+def process_content(handlers, root, f_proc, write_output=False, processes=1, chunk_size=200, pool=None):
+    '''
+    f_proc is a processor function over all the translatable elements that
+    were found in a file. It may mutate the elements, so that when we dump
+    the soup into a new file, it contains the mutated elements.
+
+    If processes > 1, the files of handlers that support it (see XMLFileHandler.chunk_tag)
+    are split into chunks of chunk_size questions that are processed in parallel
+    by a pool of processes (see process_file_chunks). f_proc then needs to be
+    a ChunkProcessor, so that the results of the worker processes are not lost.
+    pool: WorkerPool to use instead of starting a pool of processes
+        for every file (implies processes > 1)
+    '''
+    parallel = processes > 1 or pool is not None
+    if parallel and not isinstance(f_proc, ChunkProcessor):
+        raise TypeError(f"{f_proc!r} is not a ChunkProcessor and can't be used with processes > 1")
+    for fp in handlers:
+        if parallel and fp.chunk_tag is not None:
+            for path in fp.get_files(root):
+                process_file_chunks(fp, path, f_proc, write_output, processes, chunk_size, pool)
+            continue
+        for path, soup, elements in read_files([fp], root):
+            f_proc(elements)
+            if write_output:
+                write_output_file(path, soup)
+
+
+'''
+Processing a file in chunks:
+
+The raw content of the file is split into the elements with the handler's chunk_tag
+(e.g. questions) and the text between them. Consecutive elements are grouped into
+chunks which are parsed and processed by worker processes, and then serialized again.
+The output file is reassembled from the processed elements and the verbatim text
+between them, in the original order.
+
+As the processor runs in a worker process, changes to its state are lost,
+unless they are passed back to the main process via collect() and merge().
+
+By default, a pool of processes is started for each file, which receives a copy
+of the processor when it starts. Alternatively, a WorkerPool can be used for
+several files (or jobs, see daemon.py), whose processes keep their copies of
+the processor, including its caches, between chunks and files.
+'''
+
+
+class ChunkProcessor:
+    '''Base class of processors that can process files in chunks in worker processes.
+    Instances can be used as f_proc in process_content.'''
+
+    # Key of the copies of this processor held by the processes of a WorkerPool
+    worker_key = None
+
+    def __call__(self, elements):
+        self.process(elements)
+
+    def process(self, elements):
+        raise NotImplementedError
+
+    def collect(self):
+        '''Called in the worker process after processing a chunk. Returns the
+        changes to the processor's state since the last call, which are passed
+        to merge() in the main process. Must be picklable.'''
+        raise NotImplementedError
+
+    def merge(self, collected):
+        '''Apply the changes returned by collect() in a worker process.'''
+        raise NotImplementedError
+
+    def resident(self):
+        '''The processor whose copies are kept by the processes of a WorkerPool.'''
+        return self
+
+    def worker_update(self):
+        '''Return the changes to the processor's state since it was copied to
+        the processes of a WorkerPool or since the last call, or None.
+        They are passed to apply_worker_update() of the copies. Must be picklable.'''
+        return None
+
+    def apply_worker_update(self, update):
+        pass
+
+
+_chunk_handler = None
+_chunk_processor = None
+
+
+def _init_chunk_worker(handler, processor, parser_backend):
+    global _chunk_handler, _chunk_processor
+    _chunk_handler = handler
+    _chunk_processor = processor
+    extract.set_parser_backend(parser_backend)
+
+
+def _start_chunk_worker(handler, processor, parser_backend):
+    # Discard the state that the copy of the processor has from the main process
+    processor.collect()
+    _init_chunk_worker(handler, processor, parser_backend)
+
+
+def _process_chunk(texts):
+    soup = BeautifulSoup("<chunk>" + "".join(texts) + "</chunk>", 'xml')
+    _chunk_processor.process(_chunk_handler.get_chunk_elements(soup.chunk))
+    outputs = [str(e) for e in soup.chunk.findChildren(_chunk_handler.chunk_tag, recursive=False)]
+    return outputs, _chunk_processor.collect()
+
+
+# Copies of processors held by a process of a WorkerPool, by their worker_key
+_resident_processors = {}
+_worker_keys = itertools.count(1)
+
+
+def _set_resident_processor(key, processor, evicted_keys):
+    for evicted_key in evicted_keys:
+        _resident_processors.pop(evicted_key, None)
+    processor.collect()
+    # The copy doesn't need to keep track of its own changes for other processes
+    processor.worker_key = None
+    _resident_processors[key] = processor
+
+
+def _update_resident_processor(key, update):
+    _resident_processors[key].apply_worker_update(update)
+
+
+def _process_resident_chunk(args):
+    handler, key, parser_backend, texts = args
+    _init_chunk_worker(handler, _resident_processors[key], parser_backend)
+    return _process_chunk(texts)
+
+
+class WorkerPool:
+    '''
+    Pool of worker processes which keep copies of the processors they are given,
+    so that the state of a processor (e.g. the translations and caches of an
+    ElementTranslator) is sent to each process only once, after which only its
+    changes are sent (see ChunkProcessor.worker_update).
+    Each worker is a multiprocessing.Pool with a single process, so that the
+    changes can be sent to every process.
+    '''
+
+    # Maximum number of processors kept by each process
+    max_resident = 8
+
+    def __init__(self, processes):
+        self.workers = [Pool(1) for _ in range(processes)]
+        # Keys of the processors held by the workers, least recently used first
+        self.resident = OrderedDict()
+
+    def broadcast(self, func, *args):
+        '''Call func(*args) in every worker process.'''
+        results = [worker.apply_async(func, args) for worker in self.workers]
+        return [result.get() for result in results]
+
+    def map(self, func, tasks):
+        '''Like Pool.map. The tasks are assigned to the workers in turn.'''
+        results = [
+            self.workers[i % len(self.workers)].apply_async(func, (task,))
+            for i, task in enumerate(tasks)
+        ]
+        return [result.get() for result in results]
+
+    def sync(self, processor):
+        '''Make sure every worker holds an up-to-date copy of processor, and return its key.'''
+        if processor.worker_key in self.resident:
+            self.resident.move_to_end(processor.worker_key)
+            update = processor.worker_update()
+            if update:
+                self.broadcast(_update_resident_processor, processor.worker_key, update)
+            return processor.worker_key
+        processor.worker_update()
+        processor.worker_key = next(_worker_keys)
+        self.resident[processor.worker_key] = True
+        evicted_keys = []
+        while len(self.resident) > self.max_resident:
+            evicted_keys.append(self.resident.popitem(last=False)[0])
+        self.broadcast(_set_resident_processor, processor.worker_key, processor, evicted_keys)
+        return processor.worker_key
+
+    def close(self):
+        for worker in self.workers:
+            worker.close()
+            worker.join()
+
+
+def process_file_chunks(fp, path, processor, write_output, processes, chunk_size, pool=None):
+    with open(path, "r") as f:
+        content = f.read()
+    tag = fp.chunk_tag
+    matches = list(re.finditer(rf'<{tag}\b[^>]*?(/>|>.*?</{tag}>)', content, flags=re.DOTALL))
+    texts = [m.group(0) for m in matches]
+    chunks = [texts[i:i+chunk_size] for i in range(0, len(texts), chunk_size)]
+    if pool is not None:
+        key = pool.sync(processor.resident())
+        results = pool.map(_process_resident_chunk, [(fp, key, extract.parser_backend, chunk) for chunk in chunks])
+    else:
+        with Pool(processes, initializer=_start_chunk_worker, initargs=(fp, processor, extract.parser_backend)) as pool:
+            results = pool.map(_process_chunk, chunks)
+    outputs = []
+    for chunk_outputs, collected in results:
+        outputs += chunk_outputs
+        processor.merge(collected)
+    if write_output:
+        pieces = []
+        lastpos = 0
+        for m, output in zip(matches, outputs):
+            pieces.append(content[lastpos:m.start()])
+            pieces.append(output)
+            lastpos = m.end()
+        pieces.append(content[lastpos:])
+        write_output_file(path, "".join(pieces))
@@ -0,0 +1,275 @@
+from html.parser import HTMLParser
+import re
+
+from bs4.dammit import EntitySubstitution, UnicodeDammit
+
+'''
+Lightweight alternative to BeautifulSoup(html, features="html.parser").
+
+This drives the standard library's HTMLParser directly and builds a minimal
+tree, without the overhead of constructing a BeautifulSoup tree. It replicates
+how BeautifulSoup's html.parser backend builds its tree and serializes it
+(with the default "minimal" formatter), and provides the small part of the
+BeautifulSoup API that extract.py uses:
+
+    Element: .name, .attrs, .children, .text, .findChildren(), str()
+    Text/Comment/...: .name (None), .output_ready()
+
+Differences to BeautifulSoup can be detected with parsercheck.py.
+'''
+
+VOID_TAGS = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "keygen", "link",
+    "menuitem", "meta", "param", "source", "track", "wbr",
+    "basefont", "bgsound", "command", "frame", "image", "isindex", "nextid", "spacer",
+}
+# Text within these tags is not counted as text of their ancestors
+STRING_CONTAINER_TAGS = {"rt", "rp", "style", "script", "template"}
+# Text directly within these tags is not escaped
+CDATA_CONTAINING_TAGS = {"script", "style"}
+PRESERVE_WHITESPACE_TAGS = {"pre", "textarea"}
+CDATA_LIST_ATTRIBUTES = {
+    "*": {"class", "accesskey", "dropzone"},
+    "a": {"rel", "rev"},
+    "link": {"rel", "rev"},
+    "td": {"headers"},
+    "th": {"headers"},
+    "form": {"accept-charset"},
+    "object": {"archive"},
+    "area": {"rel"},
+    "icon": {"sizes"},
+    "iframe": {"sandbox"},
+    "output": {"for"},
+}
+ASCII_SPACES = "\x20\x0a\x09\x0c\x0d"
+NONWHITESPACE_RE = re.compile(r"\S+")
+
+
+def escape(text):
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def quoted_attribute_value(value):
+    value = escape(value)
+    if '"' in value:
+        if "'" in value:
+            return '"' + value.replace('"', "&quot;") + '"'
+        return "'" + value + "'"
+    return '"' + value + '"'
+
+
+class Text(str):
+    name = None
+
+    def __new__(cls, text, parent, container=None):
+        obj = super().__new__(cls, text)
+        obj.parent = parent
+        # Name of the innermost string container tag this text is in, if any
+        obj.container = container
+        return obj
+
+    def output_ready(self):
+        if self.parent.name in CDATA_CONTAINING_TAGS:
+            return str(self)
+        return escape(self)
+
+
+class Special(Text):
+    '''Comments, declarations etc. which are output verbatim.'''
+    prefix = ""
+    suffix = ""
+
+    def output_ready(self):
+        return self.prefix + self + self.suffix
+
+
+class Comment(Special):
+    prefix = "<!--"
+    suffix = "-->"
+
+
+class Doctype(Special):
+    prefix = "<!DOCTYPE "
+    suffix = ">\n"
+
+
+class Declaration(Special):
+    prefix = "<?"
+    suffix = "?>"
+
+
+class CData(Special):
+    prefix = "<![CDATA["
+    suffix = "]]>"
+
+
+class ProcessingInstruction(Special):
+    prefix = "<?"
+    suffix = ">"
+
+
+class Element:
+    def __init__(self, name, attrs, parent):
+        self.name = name
+        self.attrs = attrs
+        self.parent = parent
+        self.contents = []
+
+    @property
+    def children(self):
+        return iter(self.contents)
+
+    @property
+    def text(self):
+        container = self.name if self.name in STRING_CONTAINER_TAGS else None
+        return "".join(self._strings(container))
+
+    def _strings(self, container):
+        for child in self.contents:
+            if isinstance(child, Element):
+                yield from child._strings(container)
+            elif isinstance(child, Special):
+                if isinstance(child, CData) and container is None:
+                    yield child
+            elif child.container == container:
+                yield child
+
+    def findChildren(self):
+        '''All descendant elements'''
+        elements = []
+        for child in self.contents:
+            if isinstance(child, Element):
+                elements.append(child)
+                elements += child.findChildren()
+        return elements
+
+    def __str__(self):
+        return self.decode()
+
+    def decode(self):
+        attrs = "".join(f" {key}={quoted_attribute_value(value)}" for key, value in sorted(self.attrs.items()))
+        if not self.contents and self.name in VOID_TAGS:
+            return f"<{self.name}{attrs}/>"
+        contents = "".join(
+            child.decode() if isinstance(child, Element) else child.output_ready()
+            for child in self.contents
+        )
+        return f"<{self.name}{attrs}>{contents}</{self.name}>"
+
+
+class Document(Element):
+    def __init__(self):
+        super().__init__("[document]", {}, None)
+
+    def decode(self):
+        return "".join(
+            child.decode() if isinstance(child, Element) else child.output_ready()
+            for child in self.contents
+        )
+
+
+class TreeBuilder(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.document = Document()
+        self.stack = [self.document]
+        self.data = []
+        self.already_closed_empty_element = []
+
+    def end_data(self, cls=Text):
+        if not self.data:
+            return
+        data = "".join(self.data)
+        self.data = []
+        if not any(e.name in PRESERVE_WHITESPACE_TAGS for e in self.stack) and not data.strip(ASCII_SPACES):
+            data = "\n" if "\n" in data else " "
+        container = None
+        for e in reversed(self.stack):
+            if e.name in STRING_CONTAINER_TAGS:
+                container = e.name
+                break
+        parent = self.stack[-1]
+        parent.contents.append(cls(data, parent, container))
+
+    def handle_starttag(self, tag, attrs, handle_empty_element=True):
+        self.end_data()
+        attr_dict = {}
+        for key, value in attrs:
+            attr_dict[key] = "" if value is None else value
+        for key in CDATA_LIST_ATTRIBUTES["*"] | CDATA_LIST_ATTRIBUTES.get(tag, set()):
+            if key in attr_dict:
+                attr_dict[key] = " ".join(NONWHITESPACE_RE.findall(attr_dict[key]))
+        element = Element(tag, attr_dict, self.stack[-1])
+        self.stack[-1].contents.append(element)
+        self.stack.append(element)
+        if tag in VOID_TAGS and handle_empty_element:
+            self.handle_endtag(tag, check_already_closed=False)
+            self.already_closed_empty_element.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs, handle_empty_element=False)
+        self.handle_endtag(tag, check_already_closed=False)
+
+    def handle_endtag(self, tag, check_already_closed=True):
+        if check_already_closed and tag in self.already_closed_empty_element:
+            self.already_closed_empty_element.remove(tag)
+            return
+        self.end_data()
+        # Pop up to and including the most recent open tag with this name
+        for i in range(len(self.stack) - 1, 0, -1):
+            if self.stack[i].name == tag:
+                del self.stack[i:]
+                break
+
+    def handle_data(self, data):
+        self.data.append(data)
+
+    def handle_charref(self, name):
+        base = 16 if name[:1] in "xX" else 10
+        digits = name[1:] if base == 16 else name
+        match = re.match("^([0-9a-f]+)(.*)" if base == 16 else "^([0-9]+)(.*)", digits)
+        try:
+            self.handle_data(UnicodeDammit.numeric_character_reference(int(digits, base))[0])
+        except ValueError:
+            if match is None:
+                self.handle_data(name)
+            else:
+                self.handle_data(UnicodeDammit.numeric_character_reference(int(match.group(1), base))[0])
+                self.handle_data(match.group(2))
+
+    def handle_entityref(self, name):
+        character = EntitySubstitution.HTML_ENTITY_TO_CHARACTER.get(name)
+        self.handle_data(character if character is not None else "&" + name)
+
+    def handle_comment(self, data):
+        self.end_data()
+        self.handle_data(data)
+        self.end_data(Comment)
+
+    def handle_decl(self, decl):
+        self.end_data()
+        self.handle_data(decl[len("DOCTYPE "):])
+        self.end_data(Doctype)
+
+    def unknown_decl(self, data):
+        self.end_data()
+        if data.upper().startswith("CDATA["):
+            self.handle_data(data[len("CDATA["):])
+            self.end_data(CData)
+        else:
+            self.handle_data(data)
+            self.end_data(Declaration)
+
+    def handle_pi(self, data):
+        self.end_data()
+        self.handle_data(data)
+        self.end_data(ProcessingInstruction)
+
+
+def parse(html):
+    '''Parse html into a Document, the equivalent of BeautifulSoup(html, features="html.parser").'''
+    builder = TreeBuilder()
+    builder.feed(html)
+    builder.close()
+    builder.end_data()
+    return builder.document
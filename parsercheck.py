@@ -0,0 +1,162 @@
+import sys
+import time
+from pathlib import Path
+
+import extract
+from elements import (
+    QBankContentElement,
+    STACKTextElement,
+)
+from filehandlers import read_files
+from run import (
+    course_handlers,
+    qbank_handlers,
+)
+
+'''
+Check that the parser backends in extract.PARSER_BACKENDS are equivalent,
+and benchmark them.
+
+The element contents of a course or question bank are standardized and
+their text pieces are extracted with every backend. Any difference to the
+reference backend "html.parser" is reported. Then the time per element that
+each backend takes for this is measured.
+
+    python parsercheck.py [course folder or question bank file]
+'''
+
+REFERENCE_BACKEND = "html.parser"
+
+# Content that is rare in real courses, but where parsers tend to differ
+EDGE_CASES = [
+    "<p>Fish &amp; chips &lt;3 &gt; &nbsp;and &copy; &unknown; &#8364; &#x20AC; &#1234567890;</p>",
+    "<p>Unclosed <b>bold <i>and italic</p><p>Next paragraph with a stray </b> tag</p>",
+    "<p>Line<br>break<br/>and<br></br>more, <img src='a.png' alt=\"An 'image'\">ok</p>",
+    "<div class='  a   b ' id=\"x\" data-v='say \"hi\"' hidden>Attributes of an element</div>",
+    "<p>Before comment<!-- a comment -->after comment</p>",
+    "<p>Text <b>with <!-- comment --> inside</b> formatting</p>",
+    "<script>if (a < b && c > d) { document.write('<p>'); }</script><p>Text after the script</p>",
+    "<style>p > b { color: red; }</style><p>Text after the style</p>",
+    "<!DOCTYPE html><p>Document with a doctype</p>",
+    "<p>Some <![CDATA[character data]]> in a paragraph</p>",
+    "<?php echo 'hi'; ?><p>Text after a processing instruction</p>",
+    "<pre>  Preformatted   text\n\n  </pre>   \n\n   <p>  Spaces  </p>",
+    "<table><tr><td>Cell one</td><td>Cell two</td></tr></table>",
+    "<p>Ruby <ruby>text<rt>annotation</rt></ruby> and a <template>template text</template></p>",
+    "<p>Maths <x>\\(x^2 < y\\)</x> and <x>{@sqrt(2)@}</x> in a sentence.</p>",
+    "Text without any tags, but with a < b and c > d",
+    "<p>Uppercase <B>TAGS</B> and <A HREF='#'>links</A></p>",
+]
+
+
+def raw_content(e):
+    '''The content of the element before it was standardized.'''
+    if isinstance(e, QBankContentElement):
+        return e.element.find('text').text
+    return e.element.text
+
+
+def extraction_input(e):
+    '''The content that the element passes to extract_content.'''
+    if isinstance(e, STACKTextElement):
+        return extract.preprocess_castext(e.text)
+    return e.text
+
+
+def build_corpus(handlers=None, root=None):
+    '''
+    Return a list of (raw content, extraction input) pairs, one for each
+    element found by the handlers, plus the EDGE_CASES.
+    '''
+    corpus = [(html, html) for html in EDGE_CASES]
+    if handlers is not None:
+        extract.set_parser_backend(REFERENCE_BACKEND)
+        for path, soup, elements in read_files(handlers, root):
+            corpus += [(raw_content(e), extraction_input(e)) for e in elements]
+    return corpus
+
+
+def run_backend(backend, corpus):
+    '''Return the standardized content and the extracted strings of each corpus entry.'''
+    extract.set_parser_backend(backend)
+    return [
+        (extract.standardize_content(raw), extract.extract_content(html))
+        for raw, html in corpus
+    ]
+
+
+def check_equivalence(corpus, backends=None):
+    '''
+    Compare the results of the backends to the reference backend,
+    print the differences and return the number of differing corpus entries per backend.
+    '''
+    if backends is None:
+        backends = [b for b in extract.PARSER_BACKENDS if b != REFERENCE_BACKEND]
+    reference = run_backend(REFERENCE_BACKEND, corpus)
+    differences = {}
+    for backend in backends:
+        results = run_backend(backend, corpus)
+        differences[backend] = 0
+        for (raw, html), expected, actual in zip(corpus, reference, results):
+            if expected == actual:
+                continue
+            differences[backend] += 1
+            print("================================")
+            print(f"Backend {backend} differs on:")
+            print(raw)
+            if expected[0] != actual[0]:
+                print(f"=== standardized content, {REFERENCE_BACKEND} ===")
+                print(expected[0])
+                print(f"=== standardized content, {backend} ===")
+                print(actual[0])
+            if expected[1] != actual[1]:
+                print(f"=== extracted strings, {REFERENCE_BACKEND} ===")
+                print(expected[1])
+                print(f"=== extracted strings, {backend} ===")
+                print(actual[1])
+    extract.set_parser_backend(REFERENCE_BACKEND)
+    return differences
+
+
+def benchmark(corpus, backends=None, repeat=3):
+    '''
+    Return the time per corpus entry in seconds that each backend takes
+    to standardize and extract it (best of repeat runs).
+    '''
+    if backends is None:
+        backends = list(extract.PARSER_BACKENDS)
+    timings = {}
+    for backend in backends:
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run_backend(backend, corpus)
+            elapsed = time.perf_counter() - start
+            if best is None or elapsed < best:
+                best = elapsed
+        timings[backend] = best / len(corpus)
+    extract.set_parser_backend(REFERENCE_BACKEND)
+    return timings
+
+
+def check_parsers(handlers=None, root=None, repeat=3):
+    corpus = build_corpus(handlers, root)
+    print(f"Checking {len(corpus)} element contents.")
+    differences = check_equivalence(corpus)
+    for backend, count in differences.items():
+        print(f"{backend}: {count} differences to {REFERENCE_BACKEND}")
+    timings = benchmark(corpus, repeat=repeat)
+    reference = timings[REFERENCE_BACKEND]
+    print("Time per element:")
+    for backend, seconds in timings.items():
+        print(f"    {backend}: {seconds * 1e6:.0f}µs (speedup {reference / seconds:.2f}x)")
+    return differences, timings
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        check_parsers()
+    elif Path(sys.argv[1]).is_dir():
+        check_parsers(course_handlers(), Path(sys.argv[1]))
+    else:
+        check_parsers(qbank_handlers(sys.argv[1]), Path("."))
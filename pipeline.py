@@ -0,0 +1,152 @@
+import queue
+import threading
+
+from deepltranslator import BATCH_SIZE
+from filehandlers import (
+    read_files,
+    write_output_file,
+)
+
+'''
+Streaming alternative to running extraction, translation and insertion
+as three consecutive phases over all files.
+
+    - The main thread parses the files one by one, extracts their strings
+      and puts strings without a translation into the string queue.
+    - The translation thread takes strings from the string queue and
+      sends them to DeepL in batches as soon as they are available.
+    - The insertion thread takes the parsed files in order, waits until
+      all their strings are translated, inserts the translations
+      and writes the output file.
+
+The number of parsed files waiting for insertion is bounded, so that
+only a limited number of documents is held in memory.
+'''
+
+
+class TranslationPipeline:
+    def __init__(self, exporter, translator, element_translator, max_pending_files=4, string_filter=None):
+        '''
+        exporter: StringExporter used to extract strings from the elements
+        translator: DeepLTranslator whose cached translations are used
+            and updated with the new translations
+        element_translator: ElementTranslator used to insert the translations
+        max_pending_files: Maximum number of parsed files waiting for insertion
+        string_filter: StringFilter labelling strings that are not sent for translation
+        '''
+        self.exporter = exporter
+        self.translator = translator
+        self.element_translator = element_translator
+        self.string_filter = string_filter
+        # Guards the translator's translations, notified when they change
+        self.condition = threading.Condition()
+        self.string_queue = queue.Queue()
+        self.file_queue = queue.Queue(maxsize=max_pending_files)
+        self.requested = set()
+        self.total = 0
+        self.error = None
+
+    def run(self, handlers, root, **kwargs):
+        '''kwargs are passed on to the DeepL translation function.'''
+        self.translator.connect()
+        translation_thread = threading.Thread(target=self._translate, kwargs=kwargs)
+        insertion_thread = threading.Thread(target=self._insert)
+        translation_thread.start()
+        insertion_thread.start()
+        try:
+            for path, soup, elements in read_files(handlers, root):
+                if self.error:
+                    break
+                self._extract(path, soup, elements)
+        finally:
+            self.string_queue.put(None)
+            self.file_queue.put(None)
+            translation_thread.join()
+            insertion_thread.join()
+        if self.error:
+            raise self.error
+        # Make sure translations that didn't go through DeepL are written
+        self.translator.write_translations()
+        if self.string_filter is not None:
+            self.string_filter.print_report()
+        self.element_translator.print_report()
+        print(f"Translated {self.total} new strings.")
+
+    def _extract(self, path, soup, elements):
+        strings = self.exporter.extract_strings(elements)
+        for text in strings:
+            self.exporter.strings[text] = None
+        with self.condition:
+            missing = [
+                text for text in dict.fromkeys(strings)
+                if text not in self.translator.cached_translations and text not in self.requested
+            ]
+            if self.string_filter is not None:
+                identity = self.string_filter.apply({text: None for text in missing})
+                self.translator.cached_translations.update(identity)
+                self.exporter.strings.update(identity)
+                missing = [text for text in missing if text not in identity]
+            self.requested.update(missing)
+            for text in strings:
+                if text in self.translator.cached_translations:
+                    self.translator.new_translations[text] = self.translator.cached_translations[text]
+        for text in missing:
+            self.string_queue.put(text)
+        # Blocks if too many files are waiting for their translations
+        self.file_queue.put((path, soup, elements, strings))
+
+    def _translate(self, **kwargs):
+        done = False
+        while not done:
+            batch = []
+            # Wait for the first string, then take whatever else is
+            # available right away, up to the maximum batch size.
+            text = self.string_queue.get()
+            while text is not None:
+                batch.append(text)
+                if len(batch) == BATCH_SIZE:
+                    break
+                try:
+                    text = self.string_queue.get_nowait()
+                except queue.Empty:
+                    break
+            done = text is None
+            if not batch or self.error:
+                continue
+            try:
+                translations = self.translator.request_batch(batch, **kwargs)
+                with self.condition:
+                    try:
+                        self.translator.add_translations(translations)
+                        self.total += len(batch)
+                    finally:
+                        self.condition.notify_all()
+            except Exception as e:
+                self._fail(e)
+
+    def _insert(self):
+        cached = self.translator.cached_translations
+        while True:
+            job = self.file_queue.get()
+            if job is None:
+                break
+            if self.error:
+                # Keep consuming so that the main thread doesn't block
+                continue
+            path, soup, elements, strings = job
+            try:
+                with self.condition:
+                    self.condition.wait_for(lambda: self.error or all(text in cached for text in strings))
+                    if self.error:
+                        continue
+                    self.element_translator.update_translations({text: cached[text] for text in strings})
+                self.element_translator.process(elements)
+                write_output_file(path, soup)
+            except Exception as e:
+                self._fail(e)
+
+    def _fail(self, error):
+        with self.condition:
+            if self.error is None:
+                self.error = error
+            self.condition.notify_all()
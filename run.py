@@ -4,7 +4,13 @@ from elementhandlers import (
     ElementTranslator,
     StringExporter,
 )
-from deepltranslator import DeepLTranslator
+from deepltranslator import (
+    DeepLTranslator,
+    load_translations,
+)
+from estimator import CostEstimator
+from extract import set_parser_backend
+from pipeline import TranslationPipeline
 from filehandlers import (
     SectionXMLFileHandler,
     ActivityXMLFileHandler,
@@ -20,20 +26,39 @@ def transform_lang_code(code):
     return code.split("-")[0].lower()
 
 
-def translate_content(handlers, root, strings_file, translations_file, target_lang, source_lang='EN-US'):
-    bse = StringExporter(source_lang=transform_lang_code(source_lang))
-    process_content(handlers, root, bse.process)
+def translate_content(handlers, root, strings_file, translations_file, target_lang, source_lang='EN-US', segment_sentences=False, pipelined=False, dry_run=False, throughput=None, string_filter=None, processes=1, parser_backend="html.parser"):
+    set_parser_backend(parser_backend)
+    bse = StringExporter(source_lang=transform_lang_code(source_lang), segment_sentences=segment_sentences)
+    if dry_run:
+        estimator = CostEstimator(bse, translations_file, string_filter=string_filter, **(throughput or {}))
+        estimator.process(handlers, root)
+        estimator.print_report()
+        return estimator.report()
+
+    if pipelined:
+        translator = DeepLTranslator(None, translations_file)
+        bet = ElementTranslator(None, target_lang=transform_lang_code(target_lang), source_lang=transform_lang_code(source_lang), segment_sentences=segment_sentences)
+        pipeline = TranslationPipeline(bse, translator, bet, string_filter=string_filter)
+        pipeline.run(handlers, root, target_lang=target_lang, source_lang=source_lang, tag_handling="xml", ignore_tags="x")
+        bse.write_strings(strings_file)
+        return
+
+    process_content(handlers, root, bse, processes=processes)
+    if string_filter is not None:
+        string_filter.apply(bse.strings, load_translations(translations_file))
+        string_filter.print_report()
     bse.write_strings(strings_file)
 
     translator = DeepLTranslator(strings_file, translations_file)
     translator.translate(target_lang=target_lang, source_lang=source_lang, tag_handling="xml", ignore_tags="x")
 
-    bet = ElementTranslator(translations_file, target_lang=transform_lang_code(target_lang), source_lang=transform_lang_code(source_lang))
-    process_content(handlers, root, bet.process, write_output=True)
+    bet = ElementTranslator(translations_file, target_lang=transform_lang_code(target_lang), source_lang=transform_lang_code(source_lang), segment_sentences=segment_sentences)
+    process_content(handlers, root, bet, write_output=True, processes=processes)
+    bet.print_report()
 
 
-def translate_course(path, strings_file, translations_file, target_lang, source_lang='EN'):
-    handlers = [
+def course_handlers():
+    return [
         SectionXMLFileHandler(),
         # BackupXMLFileHandler(),    # Abbreviated stuff: can be ignored?
         ActivityXMLFileHandler("label"),
@@ -43,19 +68,28 @@ def translate_course(path, strings_file, translations_file, target_lang, source_
         PageActivityXMLFileHandler(),
         QuestionsXMLFileHandler(),
     ]
-    root = Path(path)
-    translate_content(handlers, root, strings_file, translations_file, target_lang, source_lang)
 
 
-def translate_qbank(filepath, strings_file, translations_file, target_lang, source_lang='EN'):
-    handlers = [
+def qbank_handlers(filepath):
+    return [
         QBankXMLFileHandler(filepath),
     ]
+
+
+def translate_course(path, strings_file, translations_file, target_lang, source_lang='EN', segment_sentences=False, pipelined=False, dry_run=False, throughput=None, string_filter=None, processes=1, parser_backend="html.parser"):
+    handlers = course_handlers()
+    root = Path(path)
+    return translate_content(handlers, root, strings_file, translations_file, target_lang, source_lang, segment_sentences, pipelined, dry_run, throughput, string_filter, processes, parser_backend)
+
+
+def translate_qbank(filepath, strings_file, translations_file, target_lang, source_lang='EN', segment_sentences=False, pipelined=False, dry_run=False, throughput=None, string_filter=None, processes=1, parser_backend="html.parser"):
+    handlers = qbank_handlers(filepath)
     root = Path(".")
-    translate_content(handlers, root, strings_file, translations_file, target_lang, source_lang)
+    return translate_content(handlers, root, strings_file, translations_file, target_lang, source_lang, segment_sentences, pipelined, dry_run, throughput, string_filter, processes, parser_backend)
 
 
-# translate_course("content", "strings.json", "translations.json", "FR")
-# translate_qbank("qbank.xml", "strings_qb.json", "translations_qb.json", "FR")
-# translate_qbank("alg_italian.xml", "strings_imm.json", "translations_imm.json", "EN-US", "IT")
-translate_qbank("pak_italian.xml", "strings_imm.json", "translations_imm.json", "EN-US", "IT")
+if __name__ == "__main__":
+    # translate_course("content", "strings.json", "translations.json", "FR")
+    # translate_qbank("qbank.xml", "strings_qb.json", "translations_qb.json", "FR")
+    # translate_qbank("alg_italian.xml", "strings_imm.json", "translations_imm.json", "EN-US", "IT")
+    translate_qbank("pak_italian.xml", "strings_imm.json", "translations_imm.json", "EN-US", "IT")
@@ -0,0 +1,121 @@
+import hashlib
+import json
+from multiprocessing import Pool
+from pathlib import Path
+
+from deepltranslator import DeepLTranslator
+
+'''
+Distributed translation of a strings file:
+
+    - split_strings partitions the strings file into N shards.
+      Each string is assigned to a shard by a hash of its content,
+      so the partition is the same on every machine and every run.
+    - Each shard is translated independently, e.g. in a separate process
+      or on a separate host, using translate_shard. Each shard's translations
+      are written to a separate file.
+    - merge_translations combines the shards' translation files
+      (and optionally the pre-existing translations) into a single file.
+
+translate_sharded runs all of these steps locally using several processes.
+'''
+
+
+def shard_index(text, num_shards):
+    '''Shard that the string `text` belongs to.
+    We can't use hash() as it is randomized for each python process.'''
+    digest = hashlib.sha1(text.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % num_shards
+
+
+def shard_filename(filename, index, num_shards):
+    '''e.g. strings.json -> strings.2of4.json'''
+    path = Path(filename)
+    return str(path.with_name(f"{path.stem}.{index}of{num_shards}{path.suffix}"))
+
+
+def split_strings(strings_file, num_shards):
+    '''Split the strings file into num_shards files and return their filenames.'''
+    with open(strings_file) as f:
+        strings = json.load(f)
+    shards = [{} for _ in range(num_shards)]
+    for text, value in strings.items():
+        shards[shard_index(text, num_shards)][text] = value
+    filenames = []
+    for i, shard in enumerate(shards):
+        filename = shard_filename(strings_file, i, num_shards)
+        with open(filename, "w") as f:
+            json.dump(shard, f, indent=4)
+        filenames.append(filename)
+    return filenames
+
+
+def translate_shard(shard_file, translations_file, output_file, offline=False, auth_key=None, auth_key_file="auth_key.json", **kwargs):
+    '''
+    Translate the strings of a single shard, reusing the pre-existing
+    translations from translations_file (which is not modified).
+    The translations of the shard's strings are written to output_file.
+    auth_key/auth_key_file: DeepL account to use for this shard (see DeepLTranslator)
+    kwargs are passed on to the DeepL translation function.
+    '''
+    translator = DeepLTranslator(shard_file, translations_file, output_file, offline=offline,
+                                 auth_key=auth_key, auth_key_file=auth_key_file)
+    translator.translate(**kwargs)
+    return output_file
+
+
+def _translate_shard(args):
+    shard_file, translations_file, output_file, offline, auth_key_file, kwargs = args
+    return translate_shard(shard_file, translations_file, output_file, offline, auth_key_file=auth_key_file, **kwargs)
+
+
+def merge_translations(translation_files, output_file, base_file=None):
+    '''
+    Merge the translation files into output_file, on top of the translations
+    from base_file, if provided.
+
+    If the same string has different translations in different files,
+    the first translation is kept. Returns a dict of these conflicts,
+    mapping the string to the list of its different translations.
+    '''
+    merged = {}
+    if base_file is not None and Path(base_file).is_file():
+        with open(base_file) as f:
+            merged = json.load(f)
+    conflicts = {}
+    for filename in translation_files:
+        with open(filename) as f:
+            translations = json.load(f)
+        for src, trs in translations.items():
+            if src not in merged:
+                merged[src] = trs
+            elif merged[src] != trs:
+                conflicts.setdefault(src, [merged[src]])
+                if trs not in conflicts[src]:
+                    conflicts[src].append(trs)
+    for src, trs in conflicts.items():
+        print(f"Warning: conflicting translations for {src!r}: {trs}")
+    with open(output_file, "w") as f:
+        json.dump(merged, f, indent=4)
+    return conflicts
+
+
+def translate_sharded(strings_file, translations_file, num_shards, processes=None, offline=False, auth_key_files=None, **kwargs):
+    '''
+    Translate strings_file like DeepLTranslator(strings_file, translations_file)
+    does, but split into num_shards shards translated in parallel processes.
+    translations_file is updated with the new translations.
+    auth_key_files: List of auth key files of the DeepL accounts to spread
+        the shards across. Shard i uses auth_key_files[i % len(auth_key_files)].
+        Default: all shards use auth_key.json
+    '''
+    shard_files = split_strings(strings_file, num_shards)
+    output_files = [shard_filename(translations_file, i, num_shards) for i in range(num_shards)]
+    auth_key_files = auth_key_files or ["auth_key.json"]
+    jobs = [
+        (shard_file, translations_file, output_file, offline, auth_key_files[i % len(auth_key_files)], kwargs)
+        for i, (shard_file, output_file) in enumerate(zip(shard_files, output_files))
+    ]
+    with Pool(processes or num_shards) as pool:
+        pool.map(_translate_shard, jobs)
+    return merge_translations(output_files, translations_file, base_file=translations_file)
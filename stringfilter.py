@@ -0,0 +1,77 @@
+import re
+from collections import Counter
+
+'''
+Classify extracted strings that don't contain any language,
+e.g. numbers, URLs or file names, so that they can be used
+as their own translation instead of being sent to DeepL.
+'''
+
+TAG_RE = re.compile(r'<[^<>]*>')
+X_RE = re.compile(r'<x>.*?</x>', flags=re.DOTALL)
+ENTITY_RE = re.compile(r'&[A-Za-z0-9#]+;')
+NO_WORDS_RE = re.compile(r'^[\W_]*$')
+
+RULES = {
+    # Only tags, e.g. <img src="..." alt=""/>
+    "markup": lambda text: bool(NO_WORDS_RE.match(ENTITY_RE.sub("", TAG_RE.sub("", text)))),
+    # Only maths protected by <x> tags, e.g. <x>\(x^2\)</x>.
+    "math": lambda text: "<x>" in text and bool(NO_WORDS_RE.match(ENTITY_RE.sub("", X_RE.sub("", text)))),
+    "url": re.compile(r'^(https?://|ftp://|www\.|mailto:)\S+$', flags=re.IGNORECASE).match,
+    "filename": re.compile(
+        r'^[\w\-.()]+\.(pdf|png|jpe?g|gif|svg|bmp|webp|docx?|xlsx?|pptx?|odt|ods|odp|'
+        r'txt|csv|zip|mp3|mp4|wav|ogg|webm|ggb|tex|html?)$', flags=re.IGNORECASE).match,
+    "number": re.compile(r'^[-+−±]?[\d\s.,:;%/*=()\[\]^+\-−±×÷]*\d[\d\s.,:;%/*=()\[\]^+\-−±×÷]*$').match,
+}
+
+
+class StringFilter:
+    def __init__(self, categories=None, extra_rules=None):
+        '''
+        categories: Names of the rules from RULES to apply (default: all)
+        extra_rules: Dict of additional rules, mapping a category name
+            to a regular expression that matches entire strings of this category.
+        '''
+        if categories is None:
+            categories = list(RULES)
+        self.rules = {category: RULES[category] for category in categories}
+        for category, pattern in (extra_rules or {}).items():
+            self.rules[category] = re.compile(pattern).fullmatch
+        self.counts = Counter()
+        self.chars = Counter()
+
+    def classify(self, text):
+        '''Return the category of a string that shouldn't be translated, or None.'''
+        text = text.strip()
+        for category, rule in self.rules.items():
+            if rule(text):
+                return category
+        return None
+
+    def apply(self, strings, cached_translations=None):
+        '''
+        Label the strings that shouldn't be translated as their own translation.
+        strings is a dict mapping strings to be translated to None
+        (see StringExporter). Returns the dict of labelled strings.
+        cached_translations: Pre-existing translations. Strings that already
+            have a translation would not be sent to DeepL anyway, so they are
+            neither labelled nor counted.
+        '''
+        cached_translations = cached_translations or {}
+        identity = {}
+        for text, translation in strings.items():
+            if translation is not None or text in cached_translations:
+                continue
+            category = self.classify(text)
+            if category is not None:
+                identity[text] = text
+                self.counts[category] += 1
+                self.chars[category] += len(text)
+        strings.update(identity)
+        return identity
+
+    def print_report(self):
+        total = sum(self.counts.values())
+        print(f"Skipped {total} strings without translatable text.")
+        for category, count in sorted(self.counts.items()):
+            print(f"    {category}: {count} strings, {self.chars[category]} characters")
@@ -0,0 +1,124 @@
+from bs4 import BeautifulSoup
+
+from elementhandlers import ElementTranslator
+from elements import (
+    QBankHTMLTextElement,
+    QBankSTACKTextElement,
+)
+
+
+def qbank_element(cls, html):
+    soup = BeautifulSoup(f"<questiontext><text><![CDATA[{html}]]></text></questiontext>", "xml")
+    return cls(soup.questiontext)
+
+
+def translate(translator, cls, html):
+    '''Return the content of an element with content html after translating it.'''
+    e = qbank_element(cls, html)
+    translator.process([e])
+    return e.element.find("text").text
+
+
+def multilang(text, translation, target_lang="fr"):
+    return f"{{mlang en}}{text}{{mlang}}{{mlang {target_lang}}}{translation}{{mlang}}"
+
+
+def test_segmented_translation_changed_sentence():
+    html = "<p>Compute the sum. Then do it again.</p>"
+    translator = ElementTranslator(None, "fr", segment_sentences=True)
+    translator.update_translations({"Compute the sum.": "Calculez la somme.", "Then do it again.": "Recommencez."})
+    assert translate(translator, QBankHTMLTextElement, html) == (
+        "<p>" + multilang("Compute the sum. Then do it again.", "Calculez la somme. Recommencez.") + "</p>")
+
+    translator.update_translations({"Then do it again.": "Puis recommencez."})
+    assert translate(translator, QBankHTMLTextElement, html) == (
+        "<p>" + multilang("Compute the sum. Then do it again.", "Calculez la somme. Puis recommencez.") + "</p>")
+    # The assembled translations are not mixed into the sentence translations
+    assert "Compute the sum. Then do it again." not in translator.translations
+
+
+def test_version_bumped_only_when_translation_changes():
+    translator = ElementTranslator(None, "fr")
+    version = translator.translations_version
+    translator.update_translations({"Hello world.": "Bonjour le monde."})
+    assert translator.translations_version == version
+    translator.update_translations({"Hello world.": "Bonjour le monde.", "Good morning.": "Bonjour."})
+    assert translator.translations_version == version
+    translator.update_translations({"Hello world.": "Salut le monde."})
+    assert translator.translations_version == version + 1
+
+
+def test_content_cache():
+    html = "<p>Hello world.</p>"
+    translator = ElementTranslator(None, "fr")
+    translator.update_translations({"Hello world.": "Bonjour le monde."})
+    first = translate(translator, QBankHTMLTextElement, html)
+    assert first == "<p>" + multilang("Hello world.", "Bonjour le monde.") + "</p>"
+    assert (translator.content_cache.hits, translator.content_cache.misses) == (0, 1)
+    assert translate(translator, QBankHTMLTextElement, html) == first
+    assert (translator.content_cache.hits, translator.content_cache.misses) == (1, 1)
+
+    # Adding a translation doesn't invalidate the cache
+    translator.update_translations({"Good morning.": "Bonjour."})
+    assert translate(translator, QBankHTMLTextElement, html) == first
+    assert (translator.content_cache.hits, translator.content_cache.misses) == (2, 1)
+
+
+def test_content_cache_changed_translation():
+    html = "<p>Hello world.</p>"
+    translator = ElementTranslator(None, "fr")
+    translator.update_translations({"Hello world.": "Bonjour le monde."})
+    translate(translator, QBankHTMLTextElement, html)
+    translator.update_translations({"Hello world.": "Salut le monde."})
+    assert translate(translator, QBankHTMLTextElement, html) == (
+        "<p>" + multilang("Hello world.", "Salut le monde.") + "</p>")
+    assert (translator.content_cache.hits, translator.content_cache.misses) == (0, 2)
+
+
+def test_content_cache_changed_language():
+    html = "<p>Hello world.</p>"
+    translator = ElementTranslator(None, "fr")
+    translator.update_translations({"Hello world.": "Bonjour le monde."})
+    translate(translator, QBankHTMLTextElement, html)
+    version = translator.translations_version
+    translator.target_lang = "de"
+    assert translate(translator, QBankHTMLTextElement, html) == (
+        "<p>" + multilang("Hello world.", "Bonjour le monde.", "de") + "</p>")
+    translator.source_lang = "en-gb"
+    assert translate(translator, QBankHTMLTextElement, html) == (
+        "<p>" + multilang("Hello world.", "Bonjour le monde.", "de").replace("{mlang en}", "{mlang en-gb}") + "</p>")
+    assert translator.translations_version == version
+    assert (translator.content_cache.hits, translator.content_cache.misses) == (0, 3)
+
+
+def test_content_cache_key_includes_language():
+    translator = ElementTranslator(None, "fr")
+    e = qbank_element(QBankHTMLTextElement, "<p>Hello world.</p>")
+    translator.update_translations({"Hello world.": "Bonjour le monde."})
+    translator.process([e])
+    key = (type(e).__name__, e.text, "en", "fr", translator.translations_version)
+    assert translator.content_cache.get(key) is not None
+    assert translator.content_cache.get(key[:3] + ("de",) + key[4:]) is None
+
+
+def test_stack_translations_of_two_languages():
+    html = "<p>Let \\(x\\) be a number.</p><p>Compute {@x^2@}.</p>"
+    french = ElementTranslator(None, "fr")
+    french.update_translations({
+        "Let <x>\\(x\\)</x> be a number.": "Soit <x>\\(x\\)</x> un nombre.",
+        "Compute <x>{@x^2@}</x>.": "Calculez <x>{@x^2@}</x>.",
+    })
+    german = ElementTranslator(None, "de")
+    german.update_translations({
+        "Let <x>\\(x\\)</x> be a number.": "Sei <x>\\(x\\)</x> eine Zahl.",
+        "Compute <x>{@x^2@}</x>.": "Berechne <x>{@x^2@}</x>.",
+    })
+    expected_french = (
+        "<p>" + multilang("Let \\(x\\) be a number.", "Soit \\(x\\) un nombre.") + "</p>"
+        "<p>" + multilang("Compute {@x^2@}.", "Calculez {@x^2@}.") + "</p>")
+    expected_german = (
+        "<p>" + multilang("Let \\(x\\) be a number.", "Sei \\(x\\) eine Zahl.", "de") + "</p>"
+        "<p>" + multilang("Compute {@x^2@}.", "Berechne {@x^2@}.", "de") + "</p>")
+    assert translate(french, QBankSTACKTextElement, html) == expected_french
+    assert translate(german, QBankSTACKTextElement, html) == expected_german
+    assert translate(french, QBankSTACKTextElement, html) == expected_french
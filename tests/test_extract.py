@@ -0,0 +1,61 @@
+from extract import split_sentences
+
+
+def test_split_sentences():
+    text = "This is a sentence. This is another one! And a third?"
+    assert split_sentences(text) == [
+        "This is a sentence.", " ", "This is another one!", " ", "And a third?",
+    ]
+
+
+def test_split_sentences_joins_to_original():
+    text = "First sentence.  Second sentence.\nThird sentence."
+    segments = split_sentences(text)
+    assert segments[::2] == ["First sentence.", "Second sentence.", "Third sentence."]
+    assert "".join(segments) == text
+
+
+def test_split_sentences_next_sentence_lowercase():
+    assert split_sentences("The value is 3. and more text follows.") == [
+        "The value is 3. and more text follows.",
+    ]
+
+
+def test_split_sentences_closing_quotes_and_tags():
+    text = 'He said "Stop." Then he left. <b>Bold sentence.</b> Last sentence.'
+    assert split_sentences(text)[::2] == [
+        'He said "Stop."', "Then he left.", "<b>Bold sentence.</b>", "Last sentence.",
+    ]
+
+
+def test_split_sentences_not_within_tags():
+    text = "<b>First part. Second part.</b> <x>\\(a. B\\)</x> Next sentence."
+    assert split_sentences(text)[::2] == [
+        "<b>First part. Second part.</b>", "<x>\\(a. B\\)</x> Next sentence.",
+    ]
+
+
+def test_split_sentences_after_void_tags():
+    text = '<embed src="a.svg"> First sentence. <col> Second sentence. Third sentence.'
+    assert split_sentences(text)[::2] == [
+        '<embed src="a.svg"> First sentence.', "<col> Second sentence.", "Third sentence.",
+    ]
+
+
+def test_split_sentences_abbreviations():
+    assert split_sentences("Dr. Smith arrived. He sat down.")[::2] == [
+        "Dr. Smith arrived.", "He sat down.",
+    ]
+    assert split_sentences("See e.g. Figure 1. It shows x.")[::2] == [
+        "See e.g. Figure 1.", "It shows x.",
+    ]
+    assert split_sentences("Written by J. Smith in 2020. It is short.")[::2] == [
+        "Written by J. Smith in 2020.", "It is short.",
+    ]
+
+
+def test_split_sentences_merges_short_fragments():
+    assert split_sentences("Ok. This is a sentence. Yes.") == ["Ok. This is a sentence. Yes."]
+    assert split_sentences("This is a sentence. A. B. Another sentence.")[::2] == [
+        "This is a sentence.", "A. B. Another sentence.",
+    ]
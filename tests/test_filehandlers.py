@@ -0,0 +1,112 @@
+from pathlib import Path
+
+import pytest
+
+from elementhandlers import (
+    ElementTranslator,
+    ExtractionCache,
+    StringExporter,
+)
+from filehandlers import (
+    QBankXMLFileHandler,
+    WorkerPool,
+    process_content,
+)
+
+QUESTION = '''  <question type="multichoice">
+    <name>
+      <text>Question {i}</text>
+    </name>
+    <questiontext format="html">
+      <text><![CDATA[<p>This is the text of question {i}.</p>]]></text>
+    </questiontext>
+    <generalfeedback format="html">
+      <text>Feedback for question {i}.</text>
+    </generalfeedback>
+    <correctfeedback format="html">
+      <text>Your answer is correct.</text>
+    </correctfeedback>
+    <partiallycorrectfeedback format="html">
+      <text></text>
+    </partiallycorrectfeedback>
+    <incorrectfeedback format="html">
+      <text></text>
+    </incorrectfeedback>
+  </question>
+'''
+
+
+@pytest.fixture
+def qbank(tmp_path):
+    questions = "".join(QUESTION.format(i=i) for i in range(10))
+    (tmp_path / "qbank.xml").write_text(f'<?xml version="1.0" encoding="UTF-8"?>\n<quiz>\n{questions}</quiz>\n')
+    return [QBankXMLFileHandler("qbank.xml")], tmp_path
+
+
+def test_process_content_in_chunks(qbank):
+    handlers, root = qbank
+    serial = StringExporter()
+    process_content(handlers, root, serial)
+    parallel = StringExporter()
+    process_content(handlers, root, parallel, processes=2, chunk_size=3)
+    assert len(serial.strings) == 21
+    assert parallel.strings == serial.strings
+
+
+def test_process_content_in_chunks_requires_chunk_processor(qbank):
+    handlers, root = qbank
+    exporter = StringExporter()
+
+    def f_proc(elements):
+        exporter.process(elements)
+
+    process_content(handlers, root, f_proc)
+    assert len(exporter.strings) == 21
+    with pytest.raises(TypeError):
+        process_content(handlers, root, f_proc, processes=2)
+
+
+@pytest.fixture
+def worker_pool():
+    pool = WorkerPool(2)
+    yield pool
+    pool.close()
+
+
+def test_process_content_worker_pool(qbank, worker_pool, monkeypatch, tmp_path):
+    # Output files are written to output/<path of the file>
+    monkeypatch.chdir(tmp_path)
+    handlers, root = qbank[0], Path(".")
+    extraction_cache = ExtractionCache()
+    exporter = StringExporter(extraction_cache=extraction_cache)
+    process_content(handlers, root, exporter, pool=worker_pool, chunk_size=3)
+    assert len(exporter.strings) == 21
+    # The workers' extraction statistics of the 50 elements are passed back
+    assert extraction_cache.hits + extraction_cache.misses == 50
+    extraction_misses = extraction_cache.misses
+
+    translations = {text: "FR " + text for text in exporter.strings}
+    translator = ElementTranslator(None, "fr", extraction_cache=extraction_cache)
+    translator.update_translations(translations)
+    process_content(handlers, root, translator, write_output=True, pool=worker_pool, chunk_size=3)
+    first_output = (tmp_path / "output" / "qbank.xml").read_text()
+    assert "{mlang fr}FR Your answer is correct.{mlang}" in first_output
+    # Each chunk is processed by the same worker, whose extraction cache is kept
+    assert extraction_cache.misses == extraction_misses
+    assert translator.content_cache.hits + translator.content_cache.misses == 50
+    content_misses = translator.content_cache.misses
+
+    # The workers keep the translator and its caches
+    process_content(handlers, root, translator, write_output=True, pool=worker_pool, chunk_size=3)
+    assert (tmp_path / "output" / "qbank.xml").read_text() == first_output
+    assert translator.content_cache.misses == content_misses
+    assert translator.worker_update() == {}
+
+    # Only changed translations are sent to the workers, and invalidate their caches
+    translator.update_translations({"Your answer is correct.": "Bonne réponse."})
+    assert translator.worker_updates == {"Your answer is correct.": "Bonne réponse."}
+    process_content(handlers, root, translator, write_output=True, pool=worker_pool, chunk_size=3)
+    output = (tmp_path / "output" / "qbank.xml").read_text()
+    assert "{mlang fr}Bonne réponse.{mlang}" in output
+    assert "FR Your answer is correct." not in output
+    assert translator.content_cache.misses > content_misses
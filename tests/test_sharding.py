@@ -0,0 +1,86 @@
+import json
+
+import deepltranslator
+from deepltranslator import OfflineTranslator
+from sharding import (
+    merge_translations,
+    shard_index,
+    split_strings,
+    translate_shard,
+    translate_sharded,
+)
+
+
+def write_json(path, data):
+    with open(path, "w") as f:
+        json.dump(data, f)
+    return str(path)
+
+
+def read_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def test_shard_index_is_deterministic():
+    assert shard_index("Some text", 4) == shard_index("Some text", 4)
+    assert 0 <= shard_index("Some text", 4) < 4
+
+
+def test_split_strings(tmp_path):
+    strings = {f"String {i}": None for i in range(20)}
+    filenames = split_strings(write_json(tmp_path / "strings.json", strings), 3)
+    assert [f.split("/")[-1] for f in filenames] == ["strings.0of3.json", "strings.1of3.json", "strings.2of3.json"]
+    shards = [read_json(f) for f in filenames]
+    assert sum(len(shard) for shard in shards) == len(strings)
+    for i, shard in enumerate(shards):
+        assert all(shard_index(text, 3) == i for text in shard)
+
+
+def test_merge_translations(tmp_path):
+    base = write_json(tmp_path / "base.json", {"a": "A", "b": "B"})
+    shard0 = write_json(tmp_path / "t0.json", {"b": "B", "c": "C"})
+    shard1 = write_json(tmp_path / "t1.json", {"d": "D"})
+    output = str(tmp_path / "merged.json")
+    conflicts = merge_translations([shard0, shard1], output, base_file=base)
+    assert conflicts == {}
+    assert read_json(output) == {"a": "A", "b": "B", "c": "C", "d": "D"}
+
+
+def test_merge_translations_conflicts(tmp_path):
+    base = write_json(tmp_path / "base.json", {"a": "A"})
+    shard0 = write_json(tmp_path / "t0.json", {"a": "X", "b": "B1"})
+    shard1 = write_json(tmp_path / "t1.json", {"a": "Y", "b": "B2"})
+    shard2 = write_json(tmp_path / "t2.json", {"a": "X", "b": "B1"})
+    output = str(tmp_path / "merged.json")
+    conflicts = merge_translations([shard0, shard1, shard2], output, base_file=base)
+    assert conflicts == {"a": ["A", "X", "Y"], "b": ["B1", "B2"]}
+    # The first translation is kept
+    assert read_json(output) == {"a": "A", "b": "B1"}
+
+
+def test_translate_shard_auth_key_file(tmp_path, monkeypatch):
+    used_keys = []
+
+    def fake_translator(auth_key):
+        used_keys.append(auth_key)
+        return OfflineTranslator()
+
+    monkeypatch.setattr(deepltranslator.deepl, "Translator", fake_translator)
+    key_file = write_json(tmp_path / "key.json", {"auth_key": "second-account"})
+    shard = write_json(tmp_path / "strings.0of2.json", {"Hello": None})
+    output = str(tmp_path / "t.0of2.json")
+    translate_shard(shard, str(tmp_path / "t.json"), output, auth_key_file=key_file)
+    assert used_keys == ["second-account"]
+    assert read_json(output) == {"Hello": "Hello"}
+
+
+def test_translate_sharded_offline(tmp_path):
+    strings = {f"String {i}": None for i in range(10)}
+    strings_file = write_json(tmp_path / "strings.json", strings)
+    translations_file = write_json(tmp_path / "t.json", {"String 0": "Cached"})
+    conflicts = translate_sharded(strings_file, translations_file, 3, processes=2, offline=True)
+    assert conflicts == {}
+    expected = {text: text for text in strings}
+    expected["String 0"] = "Cached"
+    assert read_json(translations_file) == expected
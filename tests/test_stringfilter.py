@@ -0,0 +1,50 @@
+import pytest
+
+from stringfilter import StringFilter
+
+
+@pytest.mark.parametrize("text, category", [
+    ('<img src="@@PLUGINFILE@@/a.png" alt=""/>', "markup"),
+    ("<br/>&nbsp;", "markup"),
+    ("<x>\\(x^2\\)</x>", "math"),
+    ("<x>\\(x\\)</x>&nbsp;", "math"),
+    ("<x>{@f(x)@}</x>, <x>\\(y\\)</x>", "math"),
+    ("https://example.com/page?id=1", "url"),
+    ("www.example.com", "url"),
+    ("worksheet_1.pdf", "filename"),
+    ("Figure (2).PNG", None),
+    ("3.14", "number"),
+    ("-1, 2 / 3", "number"),
+    ("  42  ", "number"),
+    ("Hello world", None),
+    ("Compute <x>\\(x^2\\)</x>.", None),
+    ("Version 2", None),
+])
+def test_classify(text, category):
+    assert StringFilter().classify(text) == category
+
+
+def test_categories_and_extra_rules():
+    string_filter = StringFilter(categories=["number"], extra_rules={"code": r"[A-Z]{3}-\d+"})
+    assert string_filter.classify("www.example.com") is None
+    assert string_filter.classify("ABC-123") == "code"
+    assert string_filter.classify("12") == "number"
+
+
+def test_apply():
+    string_filter = StringFilter()
+    strings = {"Hello world": None, "42": None, "7": "sieben", "www.example.com": None}
+    identity = string_filter.apply(strings)
+    assert identity == {"42": "42", "www.example.com": "www.example.com"}
+    assert strings == {"Hello world": None, "42": "42", "7": "sieben", "www.example.com": "www.example.com"}
+    assert string_filter.counts == {"number": 1, "url": 1}
+    assert string_filter.chars == {"number": 2, "url": 15}
+
+
+def test_apply_skips_cached_translations():
+    string_filter = StringFilter()
+    strings = {"42": None, "43": None}
+    identity = string_filter.apply(strings, cached_translations={"42": "42"})
+    assert identity == {"43": "43"}
+    assert strings == {"42": None, "43": "43"}
+    assert string_filter.counts == {"number": 1}